@@ -0,0 +1,186 @@
+"""データ処理のベンチマーク
+
+勤務先4件(うち2件は深夜手当あり)に 1,000 / 10,000 / 100,000 件のシフトを持つ
+ユーザーを SQLite に作成し、以下の処理時間(中央値)を計測する。
+
+- get_shifts: DBController.get_shifts による取得と金額計算
+- caliculate_amount: シフト1件ずつの金額計算
+- caliculate_amounts: 全シフトの一括金額計算
+- shift_table: シフトの表(ShiftTable)の作成
+- home_dashboard: ホーム画面の集計(ShiftIndex の作成を含む)
+- calendar_events: 全シフトのカレンダーのイベント作成
+- calendar_events_month: シフトページで表示する1か月分(前後の余白を含む)のイベント作成
+- payroll_history: 全シフトの勤務先・締め期間ごとの給料の一覧の作成
+- current_period: 1年分の日付と全ての締め日に対する期間計算(件数によらない)
+
+--save-baseline で結果を基準値として保存し、以降の実行で基準値より
+threshold の割合を超えて遅くなった処理があれば終了コード 1 で終了する。
+
+    python benchmarks/data_path.py [--sizes 1000 10000] [--save-baseline] [--threshold 0.2]
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from module.core import caliculate_amount, caliculate_amounts  # noqa: E402
+from module.core.shift_table import ShiftTable  # noqa: E402
+from module.core.shift_index import ShiftIndex  # noqa: E402
+from module.core.payroll_period import build_payroll_history, get_current_period  # noqa: E402
+from module.db.sqlite_controller import SQLiteDBController, get_connection  # noqa: E402
+from module.page.home import _build_dashboard  # noqa: E402
+from module.page.shift import _get_visible_range  # noqa: E402
+from schemas.user import InsertUserSchema  # noqa: E402
+from schemas.place import InsertPlaceSchema  # noqa: E402
+
+
+SIZES = [1_000, 10_000, 100_000]  # ユーザーごとのシフト件数
+REPEAT = 5  # 1つの処理を計測する回数
+BASELINE_PATH = ROOT_DIR / 'benchmarks' / 'baselines' / 'data_path.json'
+THRESHOLD = 0.2  # 基準値に対して許容する遅延の割合
+TODAY = datetime(2025, 6, 15, 12, 0, 0)  # 集計の基準日時(結果を安定させるため固定)
+
+# 勤務先ごとのシフトの開始時刻と勤務時間(時間)
+SHIFT_SLOTS = [(6, 5), (13, 6), (20, 7)]
+
+
+def create_user(db: SQLiteDBController, path: str, size: int, seed: int = 0) -> int:
+    """シフトを size 件持つユーザーを作成してIDを返す
+
+    シフトは勤務先ごとに1日3枠で TODAY の1年後まで遡って作成する(重複なし)。
+    """
+    rng = random.Random(seed)
+    db.add_user(InsertUserSchema(username=f'bench_{size}', password='bench'))
+    user = db.login(f'bench_{size}', 'bench')
+
+    places = [
+        db.add_place(InsertPlaceSchema(
+            user_id=user.id,
+            name=f'勤務先{index}',
+            wage=1000 + 100 * index,
+            closing_day=[10, 15, 20, 31][index],
+            pay_day=[25, 10, 5, 15][index],
+            has_night_wage=index % 2 == 0,
+        ))
+        for index in range(4)
+    ]
+
+    last_day = datetime(TODAY.year + 1, TODAY.month, TODAY.day)
+    rows = []
+    for index in range(size):
+        place = places[index % len(places)]
+        day, slot = divmod(index // len(places), len(SHIFT_SLOTS))
+        start_hour, hours = SHIFT_SLOTS[slot]
+        start_datetime = last_day - timedelta(days=day) + timedelta(hours=start_hour)
+        end_datetime = start_datetime + timedelta(hours=hours)
+        break_time = f'{rng.choice([0, 0, 0, 1]):02d}:{rng.choice([0, 30]):02d}:00'
+        rows.append((user.id, place.id, start_datetime.isoformat(), end_datetime.isoformat(), break_time))
+
+    connection = get_connection(path)
+    with connection:
+        connection.executemany(
+            'INSERT INTO shifts (user_id, place_id, start_datetime, end_datetime, break_time) VALUES (?, ?, ?, ?, ?)',
+            rows,
+        )
+    return user.id
+
+
+def measure(func: Callable[[], object], repeat: int = REPEAT) -> float:
+    """処理時間(秒)の中央値を計測"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def run(sizes: list[int], repeat: int = REPEAT) -> dict[str, float]:
+    """全ての処理を計測して {処理名[件数]: 秒} を返す"""
+    results = {}
+
+    results['current_period'] = measure(lambda: [
+        get_current_period(TODAY + timedelta(days=day), closing_day)
+        for day in range(365)
+        for closing_day in range(1, 32)
+    ], repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            path = str(Path(directory) / f'bench_{size}.db')
+            db = SQLiteDBController(path)
+            user_id = create_user(db, path, size)
+            shifts = db.get_shifts(user_id)
+
+            results[f'get_shifts[{size}]'] = measure(lambda: db.get_shifts(user_id), repeat)
+            results[f'caliculate_amount[{size}]'] = measure(lambda: [
+                caliculate_amount(shift.start_datetime, shift.end_datetime, shift.break_time, shift.wage, shift.has_night_wage)
+                for shift in shifts
+            ], repeat)
+            results[f'caliculate_amounts[{size}]'] = measure(lambda: caliculate_amounts(
+                [shift.start_datetime for shift in shifts],
+                [shift.end_datetime for shift in shifts],
+                [shift.break_time.hour * 60 + shift.break_time.minute for shift in shifts],
+                [shift.wage for shift in shifts],
+                [shift.has_night_wage for shift in shifts],
+            ), repeat)
+            table = ShiftTable(shifts)
+            results[f'shift_table[{size}]'] = measure(lambda: ShiftTable(shifts), repeat)
+            results[f'home_dashboard[{size}]'] = measure(lambda: _build_dashboard(ShiftIndex(table), TODAY), repeat)
+            results[f'payroll_history[{size}]'] = measure(lambda: build_payroll_history(table), repeat)
+            results[f'calendar_events[{size}]'] = measure(lambda: table.events(), repeat)
+            results[f'calendar_events_month[{size}]'] = measure(lambda: table.events(*_get_visible_range(datetime(TODAY.year, TODAY.month, 1))), repeat)
+
+    return results
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], threshold: float) -> list[str]:
+    """基準値より threshold の割合を超えて遅くなった処理名を返す"""
+    return [
+        name for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + threshold)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='データ処理のベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='ユーザーごとのシフト件数')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='1つの処理を計測する回数')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH, help='基準値の JSON ファイル')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='基準値に対して許容する遅延の割合')
+    parser.add_argument('--save-baseline', action='store_true', help='結果を基準値として保存')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline.exists() else {}
+
+    for name, seconds in results.items():
+        if name in baseline:
+            print(f'{name:32} {seconds * 1000:10.2f} ms  (基準値 {baseline[name] * 1000:10.2f} ms, {seconds / baseline[name]:5.2f}x)')
+        else:
+            print(f'{name:32} {seconds * 1000:10.2f} ms')
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({**baseline, **results}, indent=2) + '\n', encoding='utf-8')
+        print(f'基準値を保存しました: {args.baseline}')
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"基準値より {args.threshold:.0%} を超えて遅くなりました: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""起動時間のベンチマーク
+
+各ページのモジュールの読み込み時間(別プロセスで計測)と、
+ログインページ・ログイン後の各ページの初回表示時間を計測して JSON で出力する。
+
+ログイン後のページは、環境変数 BENCH_USERNAME と BENCH_PASSWORD に
+設定したユーザーでログインして計測する(未設定の場合はログインページのみ)。
+
+    python benchmarks/startup.py [--output startup.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from module.page import AUTHENTICATED_PAGES, ANONYMOUS_PAGES  # noqa: E402
+
+
+RENDER_TIMEOUT = 60  # 1ページの表示を待つ秒数
+
+
+def measure_import_time(module_name: str) -> float:
+    """モジュールの読み込み時間(秒)を新しいプロセスで計測"""
+    code = (
+        'import time\n'
+        'start = time.perf_counter()\n'
+        f'import {module_name}\n'
+        'print(time.perf_counter() - start)\n'
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip())
+
+
+def measure_render_times() -> dict[str, float]:
+    """ログインページとログイン後の各ページの初回表示時間(秒)を計測"""
+    render_times = {}
+
+    app = AppTest.from_file(str(ROOT_DIR / 'main.py'), default_timeout=RENDER_TIMEOUT)
+    start = time.perf_counter()
+    app.run()
+    render_times['ログイン'] = time.perf_counter() - start
+
+    username = os.getenv('BENCH_USERNAME')
+    password = os.getenv('BENCH_PASSWORD')
+    if not username or not password:
+        return render_times
+
+    app.text_input(key='username').input(username)
+    app.text_input(key='password').input(password)
+    app.button[0].click()
+    start = time.perf_counter()
+    app.run()
+    render_times['ログイン処理'] = time.perf_counter() - start
+
+    if app.exception or 'user_id' not in app.session_state:
+        raise RuntimeError('ログインに失敗しました')
+
+    for name in AUTHENTICATED_PAGES:
+        app.sidebar.selectbox[0].select(name)
+        start = time.perf_counter()
+        app.run()
+        render_times[name] = time.perf_counter() - start
+
+        if app.exception:
+            raise RuntimeError(f'{name}の表示に失敗しました: {app.exception[0].message}')
+
+    return render_times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='起動時間のベンチマーク')
+    parser.add_argument('--output', help='結果を書き込む JSON ファイル(省略時は標準出力)')
+    args = parser.parse_args()
+
+    import_times = {'main': measure_import_time('main')}
+    for target in [*ANONYMOUS_PAGES.values(), *AUTHENTICATED_PAGES.values()]:
+        module_name = f"module.page.{target.split(':')[0]}"
+        import_times[module_name] = measure_import_time(module_name)
+
+    result = {
+        'import_seconds': import_times,
+        'first_render_seconds': measure_render_times(),
+    }
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
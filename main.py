@@ -1,7 +1,9 @@
 import streamlit as st
 
-from module.db import DBController
-from module.page import show_home_page, show_place_page, show_shift_page, show_template_page, show_setting_page, show_login_page, show_create_account_page
+from module.db import create_db_controller
+from module.metrics import start_rerun, finish_rerun, span, show_metrics_sidebar
+from module.state import apply_write_behind_events
+from module.page import AUTHENTICATED_PAGES, ANONYMOUS_PAGES, load_page
 
 
 def main():
@@ -9,27 +11,33 @@ def main():
     メイン関数。シフト管理アプリケーションのエントリーポイント。
     この関数は、データベースコントローラを初期化し、ユーザーのログイン状態に応じて
     適切なメニューを表示します。選択されたメニューに基づいて、対応するページを表示します。
+    各ページのモジュールは選択されたときに初めて読み込みます。
+    書き込みを非同期で反映する場合は、反映できなかった書き込みをここで通知します。
+    METRICS=1 の場合は再実行ごとの処理時間・通信回数を計測します。
     """
-    db = DBController()
-
-    st.title('シフト管理')
-
-    if 'user_id' in st.session_state:
-        menu = {
-            'ホーム': show_home_page,
-            '勤務先': show_place_page,
-            'シフト': show_shift_page,
-            'テンプレート': show_template_page,
-            '設定': show_setting_page,
-        }
-    else:
-        menu = {
-            'ログイン': show_login_page,
-            'アカウント作成': show_create_account_page,
-        }
-
-    choice = st.sidebar.selectbox('メニュー', list(menu.keys()))
-    menu[choice](db)
+    metrics = start_rerun()
+    try:
+        db = create_db_controller(st.session_state)
+
+        st.title('シフト管理')
+
+        for message in apply_write_behind_events(db):
+            st.error(message)
+
+        if 'user_id' in st.session_state:
+            menu = AUTHENTICATED_PAGES
+        else:
+            menu = ANONYMOUS_PAGES
+
+        choice = st.sidebar.selectbox('メニュー', list(menu.keys()))
+        with span('load_page'):
+            show_page = load_page(menu[choice])
+        with span(f'page.{show_page.__name__}'):
+            show_page(db)
+    finally:
+        finish_rerun(metrics)
+
+    show_metrics_sidebar(metrics)
 
 
 if __name__ == '__main__':
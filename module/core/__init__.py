@@ -0,0 +1,2 @@
+from .amount import caliculate_amount, caliculate_amounts
+from .shift_intervals import ShiftIntervals
\ No newline at end of file
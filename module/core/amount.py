@@ -0,0 +1,119 @@
+from datetime import datetime, time
+
+import numpy as np
+
+
+NIGHT_START_MINUTE = 22 * 60  # 深夜帯の開始(22:00)
+NIGHT_END_MINUTE = 5 * 60  # 深夜帯の終了(05:00)
+NIGHT_WAGE_RATE = 1.25  # 深夜手当の割増率
+
+_DAY_MINUTES = 24 * 60
+_NIGHT_MINUTES_PER_DAY = NIGHT_END_MINUTE + (_DAY_MINUTES - NIGHT_START_MINUTE)
+_MICROSECONDS_PER_MINUTE = 60 * 1_000_000
+_MICROSECONDS_PER_SECOND = 1_000_000
+
+
+def caliculate_amount(start_datetime: datetime, end_datetime: datetime, break_time: time, wage: int, has_night_wage: bool) -> int:
+    """シフトの金額を計算"""
+    break_minutes = break_time.hour * 60 + break_time.minute
+
+    if has_night_wage:
+        start_minute, total_minutes = _split_minutes(start_datetime, end_datetime)
+        night_minutes = _count_night_minute(start_minute + total_minutes) - _count_night_minute(start_minute)
+        day_minutes = total_minutes - night_minutes
+
+        if break_minutes > 0:
+            if day_minutes > night_minutes:
+                if break_minutes < day_minutes:
+                    day_minutes -= break_minutes
+                else:
+                    day_minutes = 0
+                    night_minutes -= break_minutes
+            else:
+                if break_minutes < night_minutes:
+                    night_minutes -= break_minutes
+                else:
+                    night_minutes = 0
+                    day_minutes -= break_minutes
+
+        return round(wage * day_minutes / 60 + NIGHT_WAGE_RATE * wage * night_minutes / 60)
+
+    work_microseconds = _to_microseconds(end_datetime) - _to_microseconds(start_datetime) - break_minutes * _MICROSECONDS_PER_MINUTE
+    work_seconds = (work_microseconds // _MICROSECONDS_PER_SECOND) % (_DAY_MINUTES * 60)
+    return round(wage * work_seconds / 3600)
+
+
+def caliculate_amounts(
+    start_datetimes: np.ndarray,
+    end_datetimes: np.ndarray,
+    break_minutes: np.ndarray,
+    wages: np.ndarray,
+    has_night_wages: np.ndarray,
+) -> np.ndarray:
+    """複数シフトの金額を一括で計算
+
+    日時は datetime64 の配列、休憩時間は分単位の整数配列で受け取り、
+    caliculate_amount と同じ丸め・休憩控除で計算した金額を int64 の配列で返す。
+    """
+    start_us = np.asarray(start_datetimes, dtype='datetime64[us]').astype(np.int64)
+    end_us = np.asarray(end_datetimes, dtype='datetime64[us]').astype(np.int64)
+    break_minutes = np.asarray(break_minutes, dtype=np.int64)
+    wages = np.asarray(wages, dtype=np.int64)
+    has_night_wages = np.asarray(has_night_wages, dtype=bool)
+
+    # 深夜手当あり: 1分単位の区間を日中・深夜に分割
+    start_minute = start_us // _MICROSECONDS_PER_MINUTE
+    total_minutes = np.maximum(_ceil_div(end_us - start_us, _MICROSECONDS_PER_MINUTE), 0)
+    night_minutes = _count_night_minutes(start_minute + total_minutes) - _count_night_minutes(start_minute)
+    day_minutes = total_minutes - night_minutes
+
+    has_break = break_minutes > 0
+    day_major = day_minutes > night_minutes
+    day_short = day_major & has_break & (break_minutes >= day_minutes)
+    night_short = ~day_major & has_break & (break_minutes >= night_minutes)
+
+    new_day_minutes = np.where(day_major & has_break, np.where(day_short, 0, day_minutes - break_minutes), day_minutes)
+    new_night_minutes = np.where(day_short, night_minutes - break_minutes, night_minutes)
+    new_night_minutes = np.where(~day_major & has_break, np.where(night_short, 0, night_minutes - break_minutes), new_night_minutes)
+    new_day_minutes = np.where(night_short, day_minutes - break_minutes, new_day_minutes)
+
+    night_amounts = np.rint(wages * new_day_minutes / 60 + NIGHT_WAGE_RATE * wages * new_night_minutes / 60)
+
+    # 深夜手当なし: timedelta.seconds と同じく1日未満の秒数で計算
+    work_microseconds = end_us - start_us - break_minutes * _MICROSECONDS_PER_MINUTE
+    work_seconds = (work_microseconds // _MICROSECONDS_PER_SECOND) % (_DAY_MINUTES * 60)
+    day_amounts = np.rint(wages * work_seconds / 3600)
+
+    return np.where(has_night_wages, night_amounts, day_amounts).astype(np.int64)
+
+
+def _split_minutes(start_datetime: datetime, end_datetime: datetime) -> tuple[int, int]:
+    """開始時刻を分単位に切り捨てた値と、1分刻みで数えた勤務分数を返す"""
+    start_us = _to_microseconds(start_datetime)
+    end_us = _to_microseconds(end_datetime)
+    start_minute = start_us // _MICROSECONDS_PER_MINUTE
+    total_minutes = max(_ceil_div(end_us - start_us, _MICROSECONDS_PER_MINUTE), 0)
+    return start_minute, total_minutes
+
+
+def _count_night_minute(minute: int) -> int:
+    """1970-01-01 0時から指定分までに含まれる深夜帯の分数"""
+    days, minute_of_day = divmod(minute, _DAY_MINUTES)
+    return days * _NIGHT_MINUTES_PER_DAY + min(minute_of_day, NIGHT_END_MINUTE) + max(minute_of_day - NIGHT_START_MINUTE, 0)
+
+
+def _count_night_minutes(minutes: np.ndarray) -> np.ndarray:
+    """_count_night_minute の配列版"""
+    days, minute_of_day = np.divmod(minutes, _DAY_MINUTES)
+    return days * _NIGHT_MINUTES_PER_DAY + np.minimum(minute_of_day, NIGHT_END_MINUTE) + np.maximum(minute_of_day - NIGHT_START_MINUTE, 0)
+
+
+def _ceil_div(numerator, denominator):
+    """切り上げ除算"""
+    return -(-numerator // denominator)
+
+
+def _to_microseconds(value: datetime) -> int:
+    """naive な datetime を 1970-01-01 からのマイクロ秒に変換"""
+    delta = value.replace(tzinfo=None) - datetime(1970, 1, 1)
+    return (delta.days * 86400 + delta.seconds) * _MICROSECONDS_PER_SECOND + delta.microseconds
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from module.core.shift_table import ShiftTable
+
+
+_ONE_DAY = np.timedelta64(1, 'D')
+_END_OF_DAY = np.timedelta64(86399, 's')  # 23:59:59
+
+
+def get_closing_ends(closing_day: int, first_month: np.datetime64, last_month: np.datetime64) -> np.ndarray:
+    """first_month から last_month までの各月の締め日時(締め日 23:59:59、月末を超える場合は月末)"""
+    months = np.arange(first_month, last_month + 1, dtype='datetime64[M]')
+    month_starts = months.astype('datetime64[D]')
+    month_lengths = ((months + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    days = np.minimum(closing_day, month_lengths) - 1
+    return (month_starts + days * _ONE_DAY).astype('datetime64[s]') + _END_OF_DAY
+
+
+def get_pay_dates(pay_day: int, first_month: np.datetime64, last_month: np.datetime64) -> np.ndarray:
+    """first_month から last_month までの各月の給料日(月末を超える場合は月末)"""
+    return get_closing_ends(pay_day, first_month, last_month).astype('datetime64[D]')
+
+
+def get_current_period(today: datetime, closing_day: int) -> tuple[datetime, datetime]:
+    """today を含む締め期間の開始日時と締め日時(締め期間は assign_periods と同じ)"""
+    month = np.datetime64(today, 'M')
+    closing_ends = get_closing_ends(closing_day, month - 1, month + 1)
+    index = int(np.searchsorted(closing_ends, np.datetime64(today, 's'), side='left'))
+    return closing_ends[index - 1].item() + timedelta(seconds=1), closing_ends[index].item()
+
+
+def assign_periods(end_datetimes: np.ndarray, closing_day: int, pay_day: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """終了日時ごとに締め期間(開始日時, 締め日時)と給料日を求める
+
+    締め期間は (前月の締め日時, 締め日時] で、終了日時が含まれる期間に割り当てる。
+    給料日は締め日の翌日以降で最初の給料日とする。
+    境界の配列を1度作成し、二分探索でまとめて割り当てる。
+    """
+    end_datetimes = np.asarray(end_datetimes, dtype='datetime64[s]')
+    if len(end_datetimes) == 0:
+        empty = np.array([], dtype='datetime64[s]')
+        return empty, empty, empty.astype('datetime64[D]')
+
+    # 終了日時の範囲を含む締め日時(前後1か月の余裕を持たせる)
+    first_month = end_datetimes.min().astype('datetime64[M]') - 1
+    last_month = end_datetimes.max().astype('datetime64[M]') + 1
+    closing_ends = get_closing_ends(closing_day, first_month, last_month)
+
+    indexes = np.searchsorted(closing_ends, end_datetimes, side='left')
+    period_ends = closing_ends[indexes]
+    period_starts = closing_ends[indexes - 1] + np.timedelta64(1, 's')
+
+    # 締め日の翌日以降で最初の給料日
+    pay_dates = get_pay_dates(pay_day, first_month, last_month + 2)
+    closing_dates = period_ends.astype('datetime64[D]')
+    period_pay_dates = pay_dates[np.searchsorted(pay_dates, closing_dates + _ONE_DAY, side='left')]
+
+    return period_starts, period_ends, period_pay_dates
+
+
+def build_payroll_history(table: ShiftTable) -> pd.DataFrame:
+    """勤務先・締め期間ごとの給料の一覧(締め日時の新しい順)
+
+    列は place_id, place, period_start, period_end, pay_date, amount, shift_count。
+    """
+    frame = table.frame
+    period_starts = np.empty(len(frame), dtype='datetime64[s]')
+    period_ends = np.empty(len(frame), dtype='datetime64[s]')
+    pay_dates = np.empty(len(frame), dtype='datetime64[D]')
+
+    end_datetimes = frame['end_datetime'].to_numpy()
+    closing_days = frame['closing_day'].to_numpy()
+    pay_days = frame['pay_day'].to_numpy()
+    for positions in frame.groupby('place_id').indices.values():
+        period_starts[positions], period_ends[positions], pay_dates[positions] = assign_periods(
+            end_datetimes[positions],
+            int(closing_days[positions[0]]),
+            int(pay_days[positions[0]]),
+        )
+
+    history = (
+        pd.DataFrame({
+            'place_id': frame['place_id'],
+            'place': frame['place'].astype(str),
+            'period_start': period_starts,
+            'period_end': period_ends,
+            'pay_date': pay_dates,
+            'amount': frame['amount'],
+        })
+        .groupby(['place_id', 'place', 'period_start', 'period_end', 'pay_date'], as_index=False)
+        .agg(amount=('amount', 'sum'), shift_count=('amount', 'size'))
+    )
+    return history.sort_values(['period_end', 'place'], ascending=[False, True], ignore_index=True)
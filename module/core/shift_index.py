@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import numpy as np
+
+from module.core.shift_table import ShiftTable
+
+
+class ShiftIndex():
+    """シフトの金額集計・次回出勤日の検索用の索引
+
+    終了日時順・開始日時順に並べた配列と金額の累積和を、全体と勤務先ごとに保持する。
+    期間の金額は二分探索2回と引き算、次回出勤日は二分探索1回で求まる。
+    """
+
+    def __init__(self, table: ShiftTable):
+        frame = table.frame
+        end_datetimes = frame['end_datetime'].to_numpy()
+        start_datetimes = frame['start_datetime'].to_numpy()
+        amounts = frame['amount'].to_numpy()
+
+        self._all = _SortedShifts(end_datetimes, start_datetimes, amounts)
+        self._places: dict[int, _SortedShifts] = {
+            place_id: _SortedShifts(end_datetimes[positions], start_datetimes[positions], amounts[positions])
+            for place_id, positions in frame.groupby('place_id').indices.items()
+        }
+        # 勤務先ごとの代表シフト(勤務先名・締め日・給料日の参照用)
+        self.places: dict[int, tuple] = {
+            shift.place_id: shift
+            for shift in frame.drop_duplicates('place_id').itertuples(index=False)
+        }
+
+    def sum_amount(self, start_datetime: datetime, end_datetime: datetime, place_id: int | None = None) -> int:
+        """終了日時が (start_datetime, end_datetime] のシフトの金額合計"""
+        return self._get(place_id).sum_amount(start_datetime, end_datetime)
+
+    def next_shift(self, today: datetime, place_id: int | None = None) -> datetime | None:
+        """today より後に開始する最初のシフトの開始日時"""
+        return self._get(place_id).next_start(today)
+
+    def _get(self, place_id: int | None) -> '_SortedShifts':
+        """全体または勤務先の索引を取得"""
+        if place_id is None:
+            return self._all
+        return self._places.get(place_id, _EMPTY)
+
+
+class _SortedShifts():
+    """終了日時順の金額累積和と開始日時の昇順配列"""
+
+    def __init__(self, end_datetimes: np.ndarray, start_datetimes: np.ndarray, amounts: np.ndarray):
+        order = np.argsort(end_datetimes, kind='stable')
+
+        self.end_datetimes = end_datetimes[order]
+        self.cumulative_amounts = np.concatenate(([0], np.cumsum(amounts[order])))
+        self.start_datetimes = np.sort(start_datetimes)
+
+    def sum_amount(self, start_datetime: datetime, end_datetime: datetime) -> int:
+        """終了日時が (start_datetime, end_datetime] のシフトの金額合計"""
+        start_index, end_index = np.searchsorted(
+            self.end_datetimes,
+            np.array([start_datetime, end_datetime], dtype='datetime64[us]'),
+            side='right',
+        )
+        if end_index <= start_index:
+            return 0
+        return int(self.cumulative_amounts[end_index] - self.cumulative_amounts[start_index])
+
+    def next_start(self, today: datetime) -> datetime | None:
+        """today より後の最初の開始日時"""
+        index = np.searchsorted(self.start_datetimes, np.datetime64(today, 'us'), side='right')
+        if index == len(self.start_datetimes):
+            return None
+        return self.start_datetimes[index].astype(datetime)
+
+
+_EMPTY = _SortedShifts(np.array([], dtype='datetime64[us]'), np.array([], dtype='datetime64[us]'), np.array([], dtype=np.int64))
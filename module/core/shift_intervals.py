@@ -0,0 +1,64 @@
+from bisect import bisect_left
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from schemas.shift import ShiftRecord
+
+
+class ShiftIntervals():
+    """勤務先ごとのシフトの勤務時間の索引(重複の確認用)
+
+    勤務先ごとに開始日時順のリストと最長の勤務時間を保持する。
+    [start_datetime, end_datetime) と重なるシフトは開始日時が
+    (start_datetime - 最長の勤務時間, end_datetime) の範囲にあるため、
+    二分探索で範囲を求めて確認する。追加・削除は差分で反映する。
+    """
+
+    def __init__(self, shifts: Iterable[ShiftRecord] = ()):
+        self._places: dict[int, _PlaceIntervals] = {}
+        self.add(shifts)
+
+    def add(self, shifts: Iterable[ShiftRecord]) -> None:
+        """シフトを追加"""
+        for shift in shifts:
+            self._places.setdefault(shift.place_id, _PlaceIntervals()).add(shift)
+
+    def remove(self, shifts: Iterable[ShiftRecord]) -> None:
+        """シフトを削除"""
+        for shift in shifts:
+            if shift.place_id in self._places:
+                self._places[shift.place_id].remove(shift)
+
+    def overlaps(self, place_id: int, start_datetime: datetime, end_datetime: datetime) -> list[ShiftRecord]:
+        """勤務先のシフトのうち [start_datetime, end_datetime) と重なるもの(開始日時順)"""
+        if place_id not in self._places:
+            return []
+        return self._places[place_id].overlaps(start_datetime, end_datetime)
+
+
+class _PlaceIntervals():
+    """1つの勤務先のシフトの開始日時順のリスト"""
+
+    def __init__(self):
+        self.keys: list[tuple[datetime, int]] = []  # (開始日時, ID)
+        self.shifts: list[ShiftRecord] = []
+        self.max_duration = timedelta(0)  # 削除しても縮めない(範囲が広がるだけで結果は正しい)
+
+    def add(self, shift: ShiftRecord) -> None:
+        key = (shift.start_datetime, shift.id)
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.shifts.insert(index, shift)
+        self.max_duration = max(self.max_duration, shift.end_datetime - shift.start_datetime)
+
+    def remove(self, shift: ShiftRecord) -> None:
+        key = (shift.start_datetime, shift.id)
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            del self.keys[index]
+            del self.shifts[index]
+
+    def overlaps(self, start_datetime: datetime, end_datetime: datetime) -> list[ShiftRecord]:
+        low = bisect_left(self.keys, (start_datetime - self.max_duration,))
+        high = bisect_left(self.keys, (end_datetime,))
+        return [shift for shift in self.shifts[low:high] if shift.end_datetime > start_datetime]
@@ -0,0 +1,64 @@
+from collections.abc import Sequence
+from datetime import datetime
+from operator import attrgetter
+
+import numpy as np
+import pandas as pd
+
+from schemas.shift import ShiftRecord
+
+
+_SHIFT_ATTRIBUTES = attrgetter('id', 'place_id', 'start_datetime', 'end_datetime', 'amount', 'place_info')
+
+
+class ShiftTable():
+    """シフトを列ごとの配列で保持する表
+
+    セッションのシフト一覧と同じ順(開始日時順)の DataFrame を1度だけ作成し、
+    各画面はここから必要な列をまとめて取り出す。
+    """
+
+    def __init__(self, shifts: Sequence[ShiftRecord]):
+        ids, place_ids, start_datetimes, end_datetimes, amounts, place_infos = (
+            zip(*map(_SHIFT_ATTRIBUTES, shifts)) if shifts else ([],) * 6
+        )
+        # 勤務先情報は共有されているため、種類ごとに1度だけ参照する
+        place_codes, unique_place_infos = pd.factorize(pd.Series(place_infos, dtype=object))
+
+        self.frame = pd.DataFrame({
+            'id': np.array(ids, dtype=np.int64),
+            'place_id': np.array(place_ids, dtype=np.int64),
+            'place': pd.Categorical(np.array([info.name for info in unique_place_infos], dtype=object)[place_codes]),
+            'start_datetime': pd.DatetimeIndex(start_datetimes).as_unit('us'),
+            'end_datetime': pd.DatetimeIndex(end_datetimes).as_unit('us'),
+            'amount': np.array(amounts, dtype=np.int64),
+            'closing_day': np.array([info.closing_day for info in unique_place_infos], dtype=np.int64)[place_codes],
+            'pay_day': np.array([info.pay_day for info in unique_place_infos], dtype=np.int64)[place_codes],
+        })
+        self._ids = pd.Index(self.frame['id'])
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def position(self, id: int) -> int | None:
+        """IDのシフトの位置(セッションのシフト一覧での添字)"""
+        position = self._ids.get_indexer([id])[0]
+        return None if position < 0 else int(position)
+
+    def events(self, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[dict]:
+        """カレンダーに表示するイベントを作成(期間を指定した場合は [start_datetime, end_datetime) と重なるシフトのみ)"""
+        frame = self.frame
+        if start_datetime is not None:
+            frame = frame[frame['end_datetime'] > np.datetime64(start_datetime, 'us')]
+        if end_datetime is not None:
+            frame = frame[frame['start_datetime'] < np.datetime64(end_datetime, 'us')]
+
+        return [
+            {'id': id, 'title': title, 'start': start, 'end': end}
+            for id, title, start, end in zip(
+                frame['id'].tolist(),
+                frame['place'].tolist(),
+                np.datetime_as_string(frame['start_datetime'].to_numpy(), unit='s').tolist(),
+                np.datetime_as_string(frame['end_datetime'].to_numpy(), unit='s').tolist(),
+            )
+        ]
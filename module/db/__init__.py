@@ -1 +1,3 @@
-from .db_controller import DBController
\ No newline at end of file
+from .db_controller import DBController
+from .async_controller import AsyncDBController
+from .factory import create_db_controller, create_backend
\ No newline at end of file
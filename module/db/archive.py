@@ -0,0 +1,67 @@
+"""無効化されたレコードの退避
+
+削除やシフトの上書きで無効化(is_valid = false)されてから保持期間が過ぎたレコードを、
+退避先のテーブル(sql/create_archive_table.sql)に batch_size 件ずつ移動する。
+保持期間は無効化した日時(invalidated_at)から数える。
+同じ条件で何度実行しても、移動済みのレコードは対象にならない。
+
+- shifts, templates: 保持期間が過ぎたもの
+- places: 保持期間が過ぎ、シフト・テンプレートから参照されていないもの(シフトの退避後に判定する)
+
+    DB_BACKEND=sqlite python -m module.db.archive [--retention-days 90] [--batch-size 1000]
+"""
+import argparse
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from module.db import DBController, create_backend
+
+
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '90'))  # 無効化されたレコードを残す日数
+ARCHIVE_BATCH_SIZE = 1000  # 1つのトランザクションで移動する件数
+ARCHIVE_TABLES = ('shifts', 'templates', 'places')  # 退避する順(参照元のテーブルを先にする)
+
+
+@dataclass
+class ArchiveResult():
+    """テーブルごとの移動した件数"""
+    counts: dict[str, int] = field(default_factory=lambda: dict.fromkeys(ARCHIVE_TABLES, 0))
+
+    @property
+    def total(self) -> int:
+        """移動した件数の合計"""
+        return sum(self.counts.values())
+
+
+def archive_invalid_rows(db: DBController, before: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> ArchiveResult:
+    """無効化されたレコードを退避先のテーブルに移動
+
+    テーブルごとに、移動する件数が batch_size 未満になるまで繰り返す。
+    """
+    result = ArchiveResult()
+    for table in ARCHIVE_TABLES:
+        while True:
+            moved_count = db.archive_invalid_rows(table, before, batch_size)
+            result.counts[table] += moved_count
+            if moved_count < batch_size:
+                break
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='無効化されたレコードの退避')
+    parser.add_argument('--retention-days', type=int, default=ARCHIVE_RETENTION_DAYS, help='無効化されたレコードを残す日数(無効化した日時から)')
+    parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, help='1つのトランザクションで移動する件数')
+    args = parser.parse_args()
+
+    before = datetime.now() - timedelta(days=args.retention_days)
+    result = archive_invalid_rows(create_backend(), before, args.batch_size)
+
+    for table, count in result.counts.items():
+        print(f'{table:12} {count:10,}件')
+    print(f'{"total":12} {result.total:10,}件')
+
+
+if __name__ == '__main__':
+    main()
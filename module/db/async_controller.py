@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime
+
+from module.db.db_controller import DBController
+from schemas.user import UserSchema
+from schemas.place import PlaceSchema
+from schemas.shift import ShiftRecord
+from schemas.template import TemplateSchema
+from schemas.dashboard import HomeDashboardSchema
+
+
+class AsyncDBController():
+    """DBController の読み込みを await できるようにしたデータベース操作
+
+    各読み込みは DBController のメソッドを別スレッドで実行するため、
+    asyncio.gather でまとめて待つとクエリ(とシフトの金額計算)が並行して行われる。
+    """
+
+    def __init__(self, db: DBController):
+        self.db = db
+
+    async def login(self, username: str, password: str) -> UserSchema | None:
+        """ユーザーログイン"""
+        return await asyncio.to_thread(self.db.login, username, password)
+
+    async def get_user(self, id: int) -> UserSchema:
+        """ユーザー情報取得"""
+        return await asyncio.to_thread(self.db.get_user, id)
+
+    async def get_places(self, user_id: int) -> list[PlaceSchema]:
+        """勤務先情報取得"""
+        return await asyncio.to_thread(self.db.get_places, user_id)
+
+    async def get_shifts(self, user_id: int, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[ShiftRecord]:
+        """シフト情報取得"""
+        return await asyncio.to_thread(self.db.get_shifts, user_id, start_datetime, end_datetime)
+
+    async def get_templates(self, user_id: int) -> list[TemplateSchema]:
+        """テンプレート情報取得"""
+        return await asyncio.to_thread(self.db.get_templates, user_id)
+
+    async def get_home_dashboard(self, user_id: int, today: datetime) -> HomeDashboardSchema | None:
+        """ホーム画面の集計を取得"""
+        return await asyncio.to_thread(self.db.get_home_dashboard, user_id, today)
+
+    async def get_user_data(self, user_id: int, shifts_start_datetime: datetime | None = None) -> tuple[list[PlaceSchema], list[ShiftRecord], list[TemplateSchema]]:
+        """勤務先・シフト・テンプレートを並行して取得"""
+        places, shifts, templates = await asyncio.gather(
+            self.get_places(user_id),
+            self.get_shifts(user_id, shifts_start_datetime),
+            self.get_templates(user_id),
+        )
+        return places, shifts, templates
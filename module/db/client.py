@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+import httpx
+from postgrest.utils import SyncClient
+from supabase import create_client, Client
+
+from module.metrics import record_round_trip, span
+
+
+# from dotenv import load_dotenv  # ローカルで行う場合
+# load_dotenv()  # ローカルで行う場合
+SUPABASE_URL = os.getenv('SUPABASE_URL')
+SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+
+POOL_MAX_CONNECTIONS = 20  # プロセス全体で同時に張る接続数の上限
+POOL_MAX_KEEPALIVE_CONNECTIONS = 10  # キープアライブで保持する接続数の上限
+POOL_KEEPALIVE_EXPIRY = 60  # アイドル接続を保持する秒数
+HEALTH_CHECK_INTERVAL = 300  # ヘルスチェックの間隔(秒)
+
+_lock = threading.Lock()
+_client: Client | None = None
+_checked_at = 0.0
+
+
+def get_client() -> Client:
+    """プロセス共有の Supabase クライアントを取得
+
+    初回呼び出し時に生成し、以降は同じクライアントを返す。
+    前回のヘルスチェックから HEALTH_CHECK_INTERVAL 秒以上経過していれば
+    接続を確認し、失敗した場合は作り直す。確認はロックの外で行い、
+    確認中に他のセッションは現在のクライアントを使う。
+    """
+    global _client, _checked_at
+
+    with _lock:
+        if _client is None:
+            with span('create_client'):
+                _client = _create_client()
+            _checked_at = time.monotonic()
+            return _client
+
+        client = _client
+        if time.monotonic() - _checked_at < HEALTH_CHECK_INTERVAL:
+            return client
+        _checked_at = time.monotonic()
+
+    if _is_healthy(client):
+        return client
+
+    reset_client(client)
+    return get_client()
+
+
+def reset_client(client: Client) -> None:
+    """共有クライアントが client のままであれば破棄し、次回の get_client で作り直す
+
+    同じクライアントで通信エラーになった複数のセッションが呼び出しても、破棄するのは1回のみ。
+    """
+    global _client
+
+    with _lock:
+        if _client is not client:
+            return
+        _client = None
+    _close_client(client)
+
+
+def _create_client() -> Client:
+    """接続プール付きの Supabase クライアントを生成"""
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    postgrest = client.postgrest
+    session = postgrest.session
+    postgrest.session = SyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        follow_redirects=True,
+        http2=True,
+        event_hooks={'response': [_record_response]},
+        limits=httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+        ),
+    )
+    session.close()
+
+    return client
+
+
+def _record_response(response: httpx.Response) -> None:
+    """PostgREST との通信1回とレスポンスのバイト数を記録"""
+    response.read()
+    record_round_trip(len(response.content))
+
+
+def _is_healthy(client: Client) -> bool:
+    """軽量なクエリで接続を確認"""
+    try:
+        client.table('users').select('id').limit(1).execute()
+    except (httpx.HTTPError, OSError):
+        return False
+    return True
+
+
+def _close_client(client: Client) -> None:
+    """クライアントの接続プールを閉じる"""
+    try:
+        client.postgrest.session.close()
+    except (httpx.HTTPError, OSError):
+        pass
@@ -1,174 +1,244 @@
-from datetime import datetime, time, timedelta
+import contextvars
 import os
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+from typing import Any, TypeVar
 
-# from dotenv import load_dotenv  # ローカルで行う場合
-from supabase import create_client, Client
+import numpy as np
 
+from module.core import caliculate_amounts
 from schemas.user import UserSchema, InsertUserSchema, UpdateUserSchema
 from schemas.place import PlaceSchema, InsertPlaceSchema
-from schemas.shift import ShiftSchema, InsertShiftSchema
+from schemas.shift import ShiftRecord, ShiftPlace, ShiftRowsAdapter, InsertShiftSchema, AddShiftResultSchema
 from schemas.template import TemplateSchema, InsertTemplateSchema
+from schemas.dashboard import HomeDashboardSchema
 
 
-# load_dotenv()  # ローカルで行う場合
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+PAGE_SIZE = int(os.getenv('DB_PAGE_SIZE', '1000'))  # 1ページで取得する件数(PostgREST の max-rows 以下にする)
 
+T = TypeVar('T')
 
-class DBController():
-    def __init__(self):
-        self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+class DBController(ABC):
+    """データベース操作のインターフェース
+
+    実装は supabase_controller.SupabaseDBController と sqlite_controller.SQLiteDBController。
+    どちらを使うかは create_db_controller で環境変数 DB_BACKEND から選択する。
+
+    一覧の取得は *_page でキーセット順に1ページずつ行い、iter_* で全件を順に返す。
+    """
+    PREFETCH = False  # 一覧の取得で次のページを先読みするか
+
+    @abstractmethod
     def add_user(self, user: InsertUserSchema) -> bool:
         """ユーザー追加"""
-        response = self.supabase.table('users').select('id').eq('username', user.username).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
-
-        insert_response = self.supabase.table('users').insert(user.model_dump()).execute()
-        return bool(insert_response.data)
 
+    @abstractmethod
     def update_user(self, user: UpdateUserSchema) -> bool:
         """ユーザー情報更新"""
-        response = self.supabase.table('users').select('id').neq('id', user.id).eq('username', user.username).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
-
-        self.supabase.table('users').update(user.model_dump()).eq('id', user.id).execute()
-        return True
 
+    @abstractmethod
     def get_user(self, id: int) -> UserSchema:
         """ユーザー情報取得"""
-        response = self.supabase.table('users').select('*').eq('id', id).limit(1).execute()
-        return UserSchema.model_validate(response.data[0])
 
+    @abstractmethod
     def login(self, username: str, password: str) -> UserSchema | None:
         """ユーザーログイン"""
-        response = self.supabase.table('users').select('*').eq('username', username).eq('password', password).eq('is_valid', True).limit(1).execute()
-
-        if response.data:
-            return UserSchema.model_validate(response.data[0])
-        return None
 
-    def add_place(self, place: InsertPlaceSchema) -> bool:
+    @abstractmethod
+    def add_place(self, place: InsertPlaceSchema) -> PlaceSchema | None:
         """勤務先追加"""
-        response = self.supabase.table('places').select('id').eq('user_id', place.user_id).eq('name', place.name).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
-
-        self.supabase.table('places').insert(place.model_dump()).execute()
-        return True
 
+    @abstractmethod
     def get_places(self, user_id: int) -> list[PlaceSchema]:
         """勤務先情報取得"""
-        response = self.supabase.table('places').select('*').eq('user_id', user_id).eq('is_valid', True).order('id').execute()
-        return [PlaceSchema.model_validate(place) for place in response.data]
 
+    @abstractmethod
+    def get_places_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[PlaceSchema]:
+        """勤務先情報をID順に1ページ取得(after を指定した場合はそのIDより後から)"""
+
+    def iter_places(self, user_id: int, page_size: int = PAGE_SIZE, prefetch: bool = False) -> Iterator[PlaceSchema]:
+        """勤務先情報をID順に全件取得"""
+        return _iter_pages(lambda after: self.get_places_page(user_id, after, page_size), lambda place: place.id, page_size, prefetch)
+
+    @abstractmethod
     def delete_place(self, id: int) -> bool:
         """勤務先削除"""
-        response = self.supabase.table('shifts').select('id').eq('place_id', id).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
 
-        response = self.supabase.table('templates').select('id').eq('place_id', id).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
+    @abstractmethod
+    def add_shift(self, shift: InsertShiftSchema) -> ShiftRecord | None:
+        """シフト追加
+
+        同じ勤務先で時間が重なるシフトがある場合、is_update なら置き換え、そうでなければ None を返す。
+        """
+
+    @abstractmethod
+    def add_shifts(self, shifts: list[InsertShiftSchema]) -> list[AddShiftResultSchema]:
+        """シフト一括追加
+
+        各シフトの追加結果(追加されたシフトと置き換えたシフトのID)を入力順に返す。
+        """
+
+    @abstractmethod
+    def get_shifts(self, user_id: int, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[ShiftRecord]:
+        """シフト情報取得
+
+        start_datetime, end_datetime を指定した場合は、開始日時が [start_datetime, end_datetime) のシフトのみ取得する。
+        """
+
+    @abstractmethod
+    def get_shifts_page(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None = None,
+        limit: int = PAGE_SIZE,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> list[ShiftRecord]:
+        """シフト情報を (開始日時, ID) 順に1ページ取得
+
+        after を指定した場合は、(開始日時, ID) が after より後のシフトから limit 件取得する。
+        start_datetime, end_datetime は get_shifts と同じ。
+        """
+
+    def iter_shifts(
+        self,
+        user_id: int,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+        page_size: int = PAGE_SIZE,
+        prefetch: bool = False,
+    ) -> Iterator[ShiftRecord]:
+        """シフト情報を (開始日時, ID) 順に全件取得
+
+        page_size 件ずつ取得し、prefetch の場合は返している間に次のページを取得する。
+        """
+        return _iter_pages(
+            lambda after: self.get_shifts_page(user_id, after, page_size, start_datetime, end_datetime),
+            lambda shift: (shift.start_datetime, shift.id),
+            page_size,
+            prefetch,
+        )
 
-        self.supabase.table('places').update({'is_valid': False}).eq('id', id).execute()
-        return True
+    @abstractmethod
+    def delete_shift(self, id: int) -> bool:
+        """シフト削除"""
 
-    def add_shift(self, shift: InsertShiftSchema) -> bool:
-        """シフト追加"""
-        or_condition = (
-            f"and(end_datetime.gt.{shift.start_datetime},start_datetime.lt.{shift.end_datetime})"
-        )
-        response = self.supabase.table('shifts').select('id').eq('user_id', shift.user_id).eq('place_id', shift.place_id).eq('is_valid', True).or_(or_condition).execute()
-        if response.data:
-            if shift.is_update:
-                for delete_target_shift in response.data:
-                    self.supabase.table('shifts').update({'is_valid': False}).eq('id', delete_target_shift['id']).execute()
-            else:
-                return False
-
-        self.supabase.table('shifts').insert(shift.model_dump()).execute()
-        return True
-
-    def get_shifts(self, user_id: int) -> list[ShiftSchema]:
-        """シフト情報取得"""
-        response = self.supabase.table('shifts').select('*, places(name, wage, has_night_wage, closing_day, pay_day)').eq('user_id', user_id).eq('is_valid', True).order('start_datetime').execute()
-        shifts = response.data
-        for shift in shifts:
-            shift['start_datetime'] = datetime.fromisoformat(shift['start_datetime'])
-            shift['end_datetime'] = datetime.fromisoformat(shift['end_datetime'])
-            shift['break_time'] = time.fromisoformat(shift['break_time'])
-            shift['place'] = shift['places']['name']
-            shift['wage'] = shift['places']['wage']
-            shift['has_night_wage'] = shift['places']['has_night_wage']
-            shift['closing_day'] = shift['places']['closing_day']
-            shift['pay_day'] = shift['places']['pay_day']
-            shift['amount'] = self._caliculate_amount(
-                shift['start_datetime'],
-                shift['end_datetime'],
-                shift['break_time'],
-                shift['wage'],
-                shift['has_night_wage']
-            )
-            shift.pop('places')
+    @abstractmethod
+    def get_home_dashboard(self, user_id: int, today: datetime) -> HomeDashboardSchema | None:
+        """ホーム画面の集計を取得
 
-        return [ShiftSchema.model_validate(shift) for shift in shifts]
+        データベース側で集計できない場合は None を返す。
+        """
 
-    def delete_shift(self, id: int) -> None:
-        """シフト削除"""
-        self.supabase.table('shifts').update({'is_valid': False}).eq('id', id).execute()
-
-    def _caliculate_amount(self, start_datetime: datetime, end_datetime: datetime, break_time: time, wage: int, has_night_wage) -> int:
-        """シフトの金額を計算"""
-        if has_night_wage:
-            day_minutes = 0
-            night_minutes = 0
-            current_datetime = start_datetime
-
-            while current_datetime < end_datetime:
-                if current_datetime.hour >= 22 or current_datetime.hour < 5:
-                    night_minutes += 1
-                else:
-                    day_minutes += 1
-                current_datetime += timedelta(minutes=1)
-
-            break_minutes = break_time.hour * 60 + break_time.minute
-            if break_minutes > 0:
-                if day_minutes > night_minutes:
-                    if break_minutes < day_minutes:
-                        day_minutes -= break_minutes
-                    else:
-                        day_minutes = 0
-                        night_minutes -= break_minutes - day_minutes
-                else:
-                    if break_minutes < night_minutes:
-                        night_minutes -= break_minutes
-                    else:
-                        night_minutes = 0
-                        day_minutes -= break_minutes - night_minutes
-
-            amount = round(wage * day_minutes / 60 + 1.25 * wage * night_minutes / 60)
-        else:
-            amount = round(wage * (end_datetime - start_datetime - timedelta(hours=break_time.hour, minutes=break_time.minute)).seconds / 3600)
-
-        return amount
-
-    def add_template(self, template: InsertTemplateSchema) -> bool:
+    @abstractmethod
+    def add_template(self, template: InsertTemplateSchema) -> TemplateSchema | None:
         """テンプレート追加"""
-        response = self.supabase.table('templates').select('id').eq('name', template.name).eq('is_valid', True).limit(1).execute()
-        if response.data:
-            return False
-
-        self.supabase.table('templates').insert(template.model_dump()).execute()
-        return True
 
+    @abstractmethod
     def get_templates(self, user_id: int) -> list[TemplateSchema]:
         """テンプレート情報取得"""
-        response = self.supabase.table('templates').select('*, places(name)').eq('user_id', user_id).eq('is_valid', True).order('id').execute()
-        templates = response.data
+
+    @abstractmethod
+    def get_templates_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[TemplateSchema]:
+        """テンプレート情報をID順に1ページ取得(after を指定した場合はそのIDより後から)"""
+
+    def iter_templates(self, user_id: int, page_size: int = PAGE_SIZE, prefetch: bool = False) -> Iterator[TemplateSchema]:
+        """テンプレート情報をID順に全件取得"""
+        return _iter_pages(lambda after: self.get_templates_page(user_id, after, page_size), lambda template: template.id, page_size, prefetch)
+
+    @abstractmethod
+    def delete_template(self, id: int) -> bool:
+        """テンプレート削除"""
+
+    @abstractmethod
+    def archive_invalid_rows(self, table: str, before: datetime, batch_size: int) -> int:
+        """無効化されたレコードを退避先のテーブルに batch_size 件まで移動し、移動した件数を返す
+
+        無効化した日時が before より前のもののみ移動する。
+        """
+
+    def _plan_add_shifts(
+        self,
+        shifts: list[InsertShiftSchema],
+        existing_shifts: list[tuple[int, int, int, datetime, datetime]],
+    ) -> tuple[list[AddShiftResultSchema], list[int], set[int]]:
+        """シフト一括追加で追加するシフトと無効化するシフトを決める
+
+        existing_shifts は (id, user_id, place_id, start_datetime, end_datetime) の一覧。
+        結果の一覧、追加するシフトの添字、無効化するシフトのIDを返す。
+        """
+        periods = [
+            (datetime.fromisoformat(shift.start_datetime), datetime.fromisoformat(shift.end_datetime))
+            for shift in shifts
+        ]
+
+        results = [AddShiftResultSchema() for _ in shifts]
+        accepted_indexes: list[int] = []
+        delete_target_ids: set[int] = set()
+
+        for index, shift in enumerate(shifts):
+            key = (shift.user_id, shift.place_id)
+            start_datetime, end_datetime = periods[index]
+
+            conflict_ids = [
+                id for id, user_id, place_id, existing_start, existing_end in existing_shifts
+                if id not in delete_target_ids and (user_id, place_id) == key and existing_end > start_datetime and existing_start < end_datetime
+            ]
+            conflict_indexes = [
+                accepted_index for accepted_index in accepted_indexes
+                if (shifts[accepted_index].user_id, shifts[accepted_index].place_id) == key
+                and periods[accepted_index][1] > start_datetime and periods[accepted_index][0] < end_datetime
+            ]
+
+            if conflict_ids or conflict_indexes:
+                if not shift.is_update:
+                    continue
+
+                delete_target_ids.update(conflict_ids)
+                results[index].replaced_ids = conflict_ids
+                for conflict_index in conflict_indexes:
+                    accepted_indexes.remove(conflict_index)
+
+            accepted_indexes.append(index)
+
+        return results, accepted_indexes, delete_target_ids
+
+    def _to_shift_records(self, shifts: list[dict]) -> list[ShiftRecord]:
+        """勤務先情報(places)を結合したシフトのレコードを一括で検証して ShiftRecord に変換
+
+        勤務先情報は ShiftPlace.get で共有のオブジェクトを参照する。
+        """
+        rows = ShiftRowsAdapter.validate_python(shifts)
+        if not rows:
+            return []
+
+        amounts = caliculate_amounts(
+            np.array([row['start_datetime'] for row in rows], dtype='datetime64[us]'),
+            np.array([row['end_datetime'] for row in rows], dtype='datetime64[us]'),
+            np.array([row['break_time'].hour * 60 + row['break_time'].minute for row in rows]),
+            np.array([row['places']['wage'] for row in rows]),
+            np.array([row['places']['has_night_wage'] for row in rows]),
+        )
+
+        return [
+            ShiftRecord(
+                row['id'],
+                row['user_id'],
+                row['place_id'],
+                row['start_datetime'],
+                row['end_datetime'],
+                row['break_time'],
+                amount,
+                ShiftPlace.get(**row['places']),
+            )
+            for row, amount in zip(rows, amounts.tolist())
+        ]
+
+    def _to_template_schemas(self, templates: list[dict]) -> list[TemplateSchema]:
+        """勤務先名(places)を結合したテンプレートのレコードを TemplateSchema に変換"""
         for template in templates:
             template['start_time'] = time.fromisoformat(template['start_time'])
             template['end_time'] = time.fromisoformat(template['end_time'])
@@ -178,6 +248,46 @@ class DBController():
 
         return [TemplateSchema.model_validate(template) for template in templates]
 
-    def delete_template(self, id: int) -> None:
-        """テンプレート削除"""
-        self.supabase.table('templates').update({'is_valid': False}).eq('id', id).execute()
+
+def _iter_pages(
+    fetch_page: Callable[[Any], list[T]],
+    get_key: Callable[[T], Any],
+    page_size: int,
+    prefetch: bool,
+) -> Iterator[T]:
+    """キーセットでページを順に取得して1件ずつ返す
+
+    fetch_page は直前のページの最後のキー(最初は None)より後のページを取得する。
+    ページの件数が page_size 未満になったら終了する(空のページを確認する通信は行わない)。
+    page_size はサーバー側の取得件数の上限(PostgREST の max-rows)以下にすること。
+    """
+    if prefetch:
+        yield from _iter_pages_prefetch(fetch_page, get_key, page_size)
+        return
+
+    after = None
+    while True:
+        page = fetch_page(after)
+        yield from page
+        if len(page) < page_size:
+            return
+        after = get_key(page[-1])
+
+
+def _iter_pages_prefetch(
+    fetch_page: Callable[[Any], list[T]],
+    get_key: Callable[[T], Any],
+    page_size: int,
+) -> Iterator[T]:
+    """ページを返している間に、次のページを別スレッドで取得する(計測のコンテキストは引き継ぐ)"""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page = fetch_page(None)
+        while True:
+            next_page = None
+            if len(page) >= page_size:
+                next_page = executor.submit(contextvars.copy_context().run, fetch_page, get_key(page[-1]))
+
+            yield from page
+            if next_page is None:
+                return
+            page = next_page.result()
@@ -0,0 +1,43 @@
+import os
+from collections.abc import MutableMapping
+from uuid import uuid4
+
+from module.db.db_controller import DBController
+from module.db.instrumented import InstrumentedDBController
+from module.metrics import METRICS
+
+
+DB_BACKEND = os.getenv('DB_BACKEND', 'supabase')  # supabase または sqlite
+
+
+def create_db_controller(session_state: MutableMapping | None = None) -> DBController:
+    """環境変数 DB_BACKEND で指定されたデータベース操作を生成
+
+    環境変数 METRICS が 1 の場合は各メソッドを計測する。
+    環境変数 WRITE_BEHIND が 1 でセッションが渡された場合は、
+    シフト・テンプレートの書き込みを非同期で反映するデータベース操作を返す。
+    """
+    from module.db.write_behind import WRITE_BEHIND, WriteBehindDBController, get_worker
+
+    backend = create_backend()
+    if METRICS:
+        backend = InstrumentedDBController(backend)
+
+    if not WRITE_BEHIND or session_state is None:
+        return backend
+
+    session_id = session_state.setdefault('write_behind_session_id', uuid4().hex)
+    return WriteBehindDBController(backend, get_worker(create_backend), session_id, session_state)
+
+
+def create_backend() -> DBController:
+    """環境変数 DB_BACKEND で指定されたデータベース操作を生成(計測・非同期の書き込みなし)"""
+    if DB_BACKEND == 'supabase':
+        from module.db.supabase_controller import SupabaseDBController
+        return SupabaseDBController()
+
+    if DB_BACKEND == 'sqlite':
+        from module.db.sqlite_controller import SQLiteDBController
+        return SQLiteDBController()
+
+    raise ValueError(f'DB_BACKEND {DB_BACKEND} is not supported')
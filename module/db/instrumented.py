@@ -0,0 +1,56 @@
+from collections.abc import Callable
+
+from module.db.db_controller import DBController
+from module.metrics import span
+
+
+def _instrumented(name: str) -> Callable:
+    """backend のメソッドを計測して呼び出すメソッドを作成"""
+    def method(self: 'InstrumentedDBController', *args, **kwargs):
+        with span(f'db.{name}') as current:
+            result = getattr(self.backend, name)(*args, **kwargs)
+            current.rows = _count_rows(result)
+        return result
+
+    method.__name__ = name
+    method.__doc__ = f'{name} を計測して実行'
+    return method
+
+
+def _count_rows(result: object) -> int:
+    """戻り値に含まれるレコード数"""
+    if isinstance(result, list):
+        return len(result)
+    if result is None or isinstance(result, bool):
+        return 0
+    return 1
+
+
+class InstrumentedDBController(DBController):
+    """各メソッドの処理時間・通信回数・バイト数・レコード数を計測するデータベース操作"""
+
+    def __init__(self, backend: DBController):
+        self.backend = backend
+
+    def __getattr__(self, name: str):
+        return getattr(self.backend, name)
+
+    add_user = _instrumented('add_user')
+    update_user = _instrumented('update_user')
+    get_user = _instrumented('get_user')
+    login = _instrumented('login')
+    add_place = _instrumented('add_place')
+    get_places = _instrumented('get_places')
+    get_places_page = _instrumented('get_places_page')
+    delete_place = _instrumented('delete_place')
+    add_shift = _instrumented('add_shift')
+    add_shifts = _instrumented('add_shifts')
+    get_shifts = _instrumented('get_shifts')
+    get_shifts_page = _instrumented('get_shifts_page')
+    delete_shift = _instrumented('delete_shift')
+    get_home_dashboard = _instrumented('get_home_dashboard')
+    add_template = _instrumented('add_template')
+    get_templates = _instrumented('get_templates')
+    get_templates_page = _instrumented('get_templates_page')
+    delete_template = _instrumented('delete_template')
+    archive_invalid_rows = _instrumented('archive_invalid_rows')
@@ -0,0 +1,62 @@
+import os
+import threading
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from cachetools import TTLCache
+
+
+READ_CACHE_TTL = int(os.getenv('READ_CACHE_TTL', '300'))  # 勤務先・テンプレートの一覧を保持する秒数(0 で無効)
+READ_CACHE_MAX_ROWS = int(os.getenv('READ_CACHE_MAX_ROWS', '50000'))  # 保持するレコード数の上限(超えたら古いものから削除)
+
+
+class ReadCache():
+    """ユーザーごとの一覧をプロセス全体で共有するキャッシュ
+
+    同じユーザーの複数のセッション(タブ・端末)は同じ結果を共有する。
+    TTL で期限切れにし、レコード数の合計が上限を超えたら最も使われていないものから削除する。
+    """
+
+    def __init__(self, ttl: int = READ_CACHE_TTL, max_rows: int = READ_CACHE_MAX_ROWS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._cache: TTLCache = TTLCache(maxsize=max_rows, ttl=max(ttl, 1), getsizeof=lambda items: len(items) + 1)
+        self._generations: dict[Hashable, int] = {}
+
+    def get(self, key: Hashable, loader: Callable[[], list[Any]]) -> list[Any]:
+        """キャッシュされた一覧を取得(なければ loader で取得して保持)"""
+        if self.ttl <= 0:
+            return loader()
+
+        with self._lock:
+            items = self._cache.get(key)
+            generation = self._generations.get(key, 0)
+        if items is not None:
+            return list(items)
+
+        items = loader()
+        with self._lock:
+            # 取得中に無効化された場合は古い結果を保持しない
+            if self._generations.get(key, 0) == generation:
+                try:
+                    self._cache[key] = tuple(items)
+                except ValueError:  # 1件で上限を超える場合は保持しない
+                    pass
+        return items
+
+    def invalidate(self, key: Hashable) -> None:
+        """一覧を無効化(追加・削除したときに呼ぶ)"""
+        with self._lock:
+            self._cache.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        """全ての一覧を無効化"""
+        with self._lock:
+            for key in list(self._cache.keys()):
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._cache.clear()
+
+
+places_cache = ReadCache()
+templates_cache = ReadCache()
@@ -0,0 +1,464 @@
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from module.db.db_controller import PAGE_SIZE, DBController
+from module.db.read_cache import places_cache, templates_cache
+from module.metrics import METRICS, record_round_trip
+from schemas.user import UserSchema, InsertUserSchema, UpdateUserSchema
+from schemas.place import PlaceSchema, InsertPlaceSchema
+from schemas.shift import ShiftRecord, InsertShiftSchema, AddShiftResultSchema
+from schemas.template import TemplateSchema, InsertTemplateSchema
+from schemas.dashboard import HomeDashboardSchema
+
+
+SQLITE_PATH = os.getenv('SQLITE_PATH', 'shift.db')
+SQL_DIR = Path(__file__).resolve().parent.parent.parent / 'sql'
+
+SHIFT_COLUMNS = '''
+    s.id, s.user_id, s.place_id, s.start_datetime, s.end_datetime, s.break_time, s.is_valid,
+    p.name AS place_name, p.wage AS place_wage, p.has_night_wage AS place_has_night_wage,
+    p.closing_day AS place_closing_day, p.pay_day AS place_pay_day
+'''
+TEMPLATE_COLUMNS = '''
+    t.id, t.user_id, t.place_id, t.name, t.start_time, t.end_time, t.break_time, t.is_valid,
+    p.name AS place_name
+'''
+# 退避するテーブルごとの列と条件(sql/create_function.sql の archive_invalid_rows と同じ)
+ARCHIVE_TARGETS = {
+    'shifts': (
+        'id, user_id, place_id, start_datetime, end_datetime, break_time, is_valid, invalidated_at',
+        'NOT is_valid AND invalidated_at < :before',
+    ),
+    'templates': (
+        'id, user_id, place_id, name, start_time, end_time, break_time, is_valid, invalidated_at',
+        'NOT is_valid AND invalidated_at < :before',
+    ),
+    'places': (
+        'id, user_id, name, wage, has_night_wage, closing_day, pay_day, is_valid, invalidated_at',
+        '''NOT is_valid AND invalidated_at < :before
+            AND NOT EXISTS (SELECT 1 FROM shifts s WHERE s.place_id = places.id)
+            AND NOT EXISTS (SELECT 1 FROM templates t WHERE t.place_id = places.id)''',
+    ),
+}
+
+_lock = threading.RLock()
+_connections: dict[str, sqlite3.Connection] = {}
+
+
+def get_connection(path: str = SQLITE_PATH) -> sqlite3.Connection:
+    """プロセス共有の SQLite 接続を取得
+
+    初回接続時に sql/create_table.sql, sql/create_archive_table.sql と同じテーブル、
+    sql/create_index.sql と同じインデックスを作成する。
+    """
+    with _lock:
+        if path not in _connections:
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA foreign_keys = ON')
+            if METRICS:
+                connection.set_trace_callback(lambda statement: record_round_trip())
+            if path != ':memory:':
+                connection.execute('PRAGMA journal_mode = WAL')
+            _create_schema(connection)
+            _connections[path] = connection
+
+        return _connections[path]
+
+
+def _create_schema(connection: sqlite3.Connection) -> None:
+    """テーブルとインデックスを作成"""
+    create_table = (SQL_DIR / 'create_table.sql').read_text(encoding='utf-8')
+    create_table = (
+        create_table
+        .replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY AUTOINCREMENT')
+        .replace('CREATE TABLE ', 'CREATE TABLE IF NOT EXISTS ')
+    )
+    connection.executescript(create_table)
+
+    # 既存のテーブルへの列の追加は PostgreSQL 固有の構文のため除き、_add_invalidated_at で行う
+    for statement in _read_statements(SQL_DIR / 'create_archive_table.sql'):
+        if statement.startswith('CREATE'):
+            connection.execute(statement)
+    _add_invalidated_at(connection)
+
+    # 排他制約など PostgreSQL 固有の定義は除き、インデックスのみ作成
+    for statement in _read_statements(SQL_DIR / 'create_index.sql'):
+        if statement.startswith('CREATE INDEX'):
+            connection.execute(statement)
+    connection.commit()
+
+
+def _add_invalidated_at(connection: sqlite3.Connection) -> None:
+    """以前の形式のファイルに invalidated_at 列を追加
+
+    列を追加する前に無効化されたレコードは、追加した日時に無効化したものとする。
+    """
+    for table in ARCHIVE_TARGETS:
+        for target in (table, f'{table}_archive'):
+            columns = [row['name'] for row in connection.execute(f'PRAGMA table_info({target})')]
+            if 'invalidated_at' not in columns:
+                connection.execute(f'ALTER TABLE {target} ADD COLUMN invalidated_at TIMESTAMP')
+        connection.execute(
+            f'UPDATE {table} SET invalidated_at = ? WHERE NOT is_valid AND invalidated_at IS NULL',
+            (_to_text(datetime.now()),),
+        )
+
+
+def _read_statements(path: Path) -> list[str]:
+    """SQL ファイルをコメントを除いた文の一覧にする"""
+    lines = [
+        line for line in path.read_text(encoding='utf-8').splitlines()
+        if not line.strip().startswith('--')
+    ]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+class SQLiteDBController(DBController):
+    """組み込みの SQLite を使うデータベース操作
+
+    単一ノードでの運用や、ネットワークを介さないベンチマーク・負荷試験に使う。
+    """
+
+    def __init__(self, path: str = SQLITE_PATH):
+        self.path = path
+        self.connection = get_connection(path)
+
+    def add_user(self, user: InsertUserSchema) -> bool:
+        """ユーザー追加"""
+        with self._transaction() as connection:
+            row = connection.execute('SELECT id FROM users WHERE username = ? AND is_valid LIMIT 1', (user.username,)).fetchone()
+            if row is not None:
+                return False
+
+            connection.execute('INSERT INTO users (username, password) VALUES (?, ?)', (user.username, user.password))
+            return True
+
+    def update_user(self, user: UpdateUserSchema) -> bool:
+        """ユーザー情報更新"""
+        with self._transaction() as connection:
+            row = connection.execute('SELECT id FROM users WHERE id <> ? AND username = ? AND is_valid LIMIT 1', (user.id, user.username)).fetchone()
+            if row is not None:
+                return False
+
+            connection.execute(
+                'UPDATE users SET username = ?, password = ?, goal_amount = ? WHERE id = ?',
+                (user.username, user.password, user.goal_amount, user.id),
+            )
+            return True
+
+    def get_user(self, id: int) -> UserSchema:
+        """ユーザー情報取得"""
+        with self._transaction() as connection:
+            row = connection.execute('SELECT * FROM users WHERE id = ? LIMIT 1', (id,)).fetchone()
+        return UserSchema.model_validate(dict(row))
+
+    def login(self, username: str, password: str) -> UserSchema | None:
+        """ユーザーログイン"""
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT * FROM users WHERE username = ? AND password = ? AND is_valid LIMIT 1',
+                (username, password),
+            ).fetchone()
+
+        if row is not None:
+            return UserSchema.model_validate(dict(row))
+        return None
+
+    def add_place(self, place: InsertPlaceSchema) -> PlaceSchema | None:
+        """勤務先追加"""
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT id FROM places WHERE user_id = ? AND name = ? AND is_valid LIMIT 1',
+                (place.user_id, place.name),
+            ).fetchone()
+            if row is not None:
+                return None
+
+            row = connection.execute(
+                'INSERT INTO places (user_id, name, wage, has_night_wage, closing_day, pay_day) VALUES (?, ?, ?, ?, ?, ?) RETURNING *',
+                (place.user_id, place.name, place.wage, place.has_night_wage, place.closing_day, place.pay_day),
+            ).fetchone()
+
+        places_cache.invalidate((self.path, place.user_id))
+        return PlaceSchema.model_validate(dict(row))
+
+    def get_places(self, user_id: int) -> list[PlaceSchema]:
+        """勤務先情報取得(プロセス全体でキャッシュ)"""
+        return places_cache.get((self.path, user_id), lambda: list(self.iter_places(user_id, prefetch=self.PREFETCH)))
+
+    def get_places_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[PlaceSchema]:
+        """勤務先情報をID順に1ページ取得"""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                'SELECT * FROM places WHERE user_id = ? AND is_valid AND id > ? ORDER BY id LIMIT ?',
+                (user_id, after or 0, limit),
+            ).fetchall()
+        return [PlaceSchema.model_validate(dict(row)) for row in rows]
+
+    def delete_place(self, id: int) -> bool:
+        """勤務先削除"""
+        with self._transaction() as connection:
+            if connection.execute('SELECT id FROM shifts WHERE place_id = ? AND is_valid LIMIT 1', (id,)).fetchone() is not None:
+                return False
+
+            if connection.execute('SELECT id FROM templates WHERE place_id = ? AND is_valid LIMIT 1', (id,)).fetchone() is not None:
+                return False
+
+            row = connection.execute(
+                'UPDATE places SET is_valid = false, invalidated_at = ? WHERE id = ? RETURNING user_id',
+                (_to_text(datetime.now()), id),
+            ).fetchone()
+
+        if row is not None:
+            places_cache.invalidate((self.path, row['user_id']))
+        return row is not None
+
+    def add_shift(self, shift: InsertShiftSchema) -> ShiftRecord | None:
+        """シフト追加"""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                'SELECT id FROM shifts WHERE user_id = ? AND place_id = ? AND is_valid AND end_datetime > ? AND start_datetime < ?',
+                (shift.user_id, shift.place_id, _to_text(shift.start_datetime), _to_text(shift.end_datetime)),
+            ).fetchall()
+            if rows:
+                if not shift.is_update:
+                    return None
+                self._invalidate(connection, 'shifts', [row['id'] for row in rows])
+
+            id = self._insert_shift(connection, shift)
+            return self._select_shifts(connection, [id])[0]
+
+    def add_shifts(self, shifts: list[InsertShiftSchema]) -> list[AddShiftResultSchema]:
+        """シフト一括追加"""
+        if not shifts:
+            return []
+
+        range_start = min(datetime.fromisoformat(shift.start_datetime) for shift in shifts)
+        range_end = max(datetime.fromisoformat(shift.end_datetime) for shift in shifts)
+        user_ids = list({shift.user_id for shift in shifts})
+        place_ids = list({shift.place_id for shift in shifts})
+
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f'''
+                SELECT id, user_id, place_id, start_datetime, end_datetime FROM shifts
+                WHERE user_id IN ({_placeholders(user_ids)}) AND place_id IN ({_placeholders(place_ids)})
+                    AND is_valid AND end_datetime > ? AND start_datetime < ?
+                ''',
+                (*user_ids, *place_ids, _to_text(range_start), _to_text(range_end)),
+            ).fetchall()
+            existing_shifts = [
+                (
+                    row['id'],
+                    row['user_id'],
+                    row['place_id'],
+                    datetime.fromisoformat(row['start_datetime']),
+                    datetime.fromisoformat(row['end_datetime']),
+                )
+                for row in rows
+            ]
+
+            results, accepted_indexes, delete_target_ids = self._plan_add_shifts(shifts, existing_shifts)
+
+            self._invalidate(connection, 'shifts', list(delete_target_ids))
+
+            ids = [self._insert_shift(connection, shifts[index]) for index in accepted_indexes]
+            for index, inserted_shift in zip(accepted_indexes, self._select_shifts(connection, ids)):
+                results[index].shift = inserted_shift
+
+        return results
+
+    def get_shifts(self, user_id: int, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[ShiftRecord]:
+        """シフト情報取得"""
+        return list(self.iter_shifts(user_id, start_datetime, end_datetime, prefetch=self.PREFETCH))
+
+    def get_shifts_page(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None = None,
+        limit: int = PAGE_SIZE,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> list[ShiftRecord]:
+        """シフト情報を (開始日時, ID) 順に1ページ取得"""
+        conditions = ['s.user_id = ?', 's.is_valid']
+        params: list = [user_id]
+        if start_datetime is not None:
+            conditions.append('s.start_datetime >= ?')
+            params.append(_to_text(start_datetime))
+        if end_datetime is not None:
+            conditions.append('s.start_datetime < ?')
+            params.append(_to_text(end_datetime))
+        if after is not None:
+            conditions.append('(s.start_datetime, s.id) > (?, ?)')
+            params.extend([_to_text(after[0]), after[1]])
+
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f'''
+                SELECT {SHIFT_COLUMNS} FROM shifts s JOIN places p ON p.id = s.place_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY s.start_datetime, s.id
+                LIMIT ?
+                ''',
+                [*params, limit],
+            ).fetchall()
+
+        return self._to_shift_records([_to_shift_row(row) for row in rows])
+
+    def delete_shift(self, id: int) -> bool:
+        """シフト削除"""
+        with self._transaction() as connection:
+            return self._invalidate(connection, 'shifts', [id]) > 0
+
+    def get_home_dashboard(self, user_id: int, today: datetime) -> HomeDashboardSchema | None:
+        """ホーム画面の集計を取得(SQLite では集計しないため None)"""
+        return None
+
+    def add_template(self, template: InsertTemplateSchema) -> TemplateSchema | None:
+        """テンプレート追加"""
+        with self._transaction() as connection:
+            row = connection.execute('SELECT id FROM templates WHERE name = ? AND is_valid LIMIT 1', (template.name,)).fetchone()
+            if row is not None:
+                return None
+
+            row = connection.execute(
+                'INSERT INTO templates (user_id, place_id, name, start_time, end_time, break_time) VALUES (?, ?, ?, ?, ?, ?) RETURNING id',
+                (template.user_id, template.place_id, template.name, template.start_time, template.end_time, template.break_time),
+            ).fetchone()
+            row = connection.execute(
+                f'SELECT {TEMPLATE_COLUMNS} FROM templates t JOIN places p ON p.id = t.place_id WHERE t.id = ?',
+                (row['id'],),
+            ).fetchone()
+
+        templates_cache.invalidate((self.path, template.user_id))
+        return self._to_template_schemas([_to_template_record(row)])[0]
+
+    def get_templates(self, user_id: int) -> list[TemplateSchema]:
+        """テンプレート情報取得(プロセス全体でキャッシュ)"""
+        return templates_cache.get((self.path, user_id), lambda: list(self.iter_templates(user_id, prefetch=self.PREFETCH)))
+
+    def get_templates_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[TemplateSchema]:
+        """テンプレート情報をID順に1ページ取得"""
+        with self._transaction() as connection:
+            rows = connection.execute(
+                f'''
+                SELECT {TEMPLATE_COLUMNS} FROM templates t JOIN places p ON p.id = t.place_id
+                WHERE t.user_id = ? AND t.is_valid AND t.id > ?
+                ORDER BY t.id
+                LIMIT ?
+                ''',
+                (user_id, after or 0, limit),
+            ).fetchall()
+
+        return self._to_template_schemas([_to_template_record(row) for row in rows])
+
+    def delete_template(self, id: int) -> bool:
+        """テンプレート削除"""
+        with self._transaction() as connection:
+            row = connection.execute(
+                'UPDATE templates SET is_valid = false, invalidated_at = ? WHERE id = ? RETURNING user_id',
+                (_to_text(datetime.now()), id),
+            ).fetchone()
+
+        if row is None:
+            return False
+        templates_cache.invalidate((self.path, row['user_id']))
+        return True
+
+    def archive_invalid_rows(self, table: str, before: datetime, batch_size: int) -> int:
+        """無効化されたレコードを退避先のテーブルに batch_size 件まで移動し、移動した件数を返す
+
+        sql/create_function.sql の archive_invalid_rows と同じ条件で、1つのトランザクションで移動する。
+        """
+        columns, condition = ARCHIVE_TARGETS[table]
+        with self._transaction() as connection:
+            ids = [
+                row['id'] for row in connection.execute(
+                    f'SELECT id FROM {table} WHERE {condition} ORDER BY id LIMIT :batch_size',
+                    {'before': _to_text(before), 'batch_size': batch_size},
+                ).fetchall()
+            ]
+            if not ids:
+                return 0
+
+            connection.execute(
+                f'INSERT OR IGNORE INTO {table}_archive ({columns}) SELECT {columns} FROM {table} WHERE id IN ({_placeholders(ids)})',
+                ids,
+            )
+            connection.execute(f'DELETE FROM {table} WHERE id IN ({_placeholders(ids)})', ids)
+        return len(ids)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """排他的にトランザクションを実行(例外時はロールバック)"""
+        with _lock, self.connection:
+            yield self.connection
+
+    def _insert_shift(self, connection: sqlite3.Connection, shift: InsertShiftSchema) -> int:
+        """シフトを追加してIDを返す"""
+        row = connection.execute(
+            'INSERT INTO shifts (user_id, place_id, start_datetime, end_datetime, break_time) VALUES (?, ?, ?, ?, ?) RETURNING id',
+            (shift.user_id, shift.place_id, _to_text(shift.start_datetime), _to_text(shift.end_datetime), shift.break_time),
+        ).fetchone()
+        return row['id']
+
+    def _select_shifts(self, connection: sqlite3.Connection, ids: list[int]) -> list[ShiftRecord]:
+        """指定したIDのシフトを勤務先情報と合わせて取得(ID順)"""
+        if not ids:
+            return []
+
+        rows = connection.execute(
+            f'SELECT {SHIFT_COLUMNS} FROM shifts s JOIN places p ON p.id = s.place_id WHERE s.id IN ({_placeholders(ids)}) ORDER BY s.id',
+            ids,
+        ).fetchall()
+        return self._to_shift_records([_to_shift_row(row) for row in rows])
+
+    def _invalidate(self, connection: sqlite3.Connection, table: str, ids: list[int]) -> int:
+        """指定したIDのレコードを無効化し(無効化した日時を記録)、更新件数を返す"""
+        if not ids:
+            return 0
+
+        cursor = connection.execute(
+            f'UPDATE {table} SET is_valid = false, invalidated_at = ? WHERE id IN ({_placeholders(ids)})',
+            [_to_text(datetime.now()), *ids],
+        )
+        return cursor.rowcount
+
+
+def _placeholders(values: list) -> str:
+    """IN 句のプレースホルダー"""
+    return ', '.join('?' for _ in values)
+
+
+def _to_text(value: str | datetime) -> str:
+    """日時を比較可能な文字列(YYYY-MM-DDTHH:MM:SS)に揃える"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.isoformat(timespec='seconds')
+
+
+def _to_shift_row(row: sqlite3.Row) -> dict:
+    """シフトの行を Supabase のレスポンスと同じ形(places を結合)にする"""
+    record = {key: row[key] for key in row.keys() if not key.startswith('place_') or key == 'place_id'}
+    record['places'] = {
+        'name': row['place_name'],
+        'wage': row['place_wage'],
+        'has_night_wage': bool(row['place_has_night_wage']),
+        'closing_day': row['place_closing_day'],
+        'pay_day': row['place_pay_day'],
+    }
+    return record
+
+
+def _to_template_record(row: sqlite3.Row) -> dict:
+    """テンプレートの行を Supabase のレスポンスと同じ形(places を結合)にする"""
+    record = {key: row[key] for key in row.keys() if key != 'place_name'}
+    record['places'] = {'name': row['place_name']}
+    return record
@@ -0,0 +1,359 @@
+import functools
+from collections.abc import Callable, Iterator
+from datetime import datetime
+
+import httpx
+from postgrest import APIError, SyncQueryRequestBuilder
+from supabase import Client
+
+from module.db.client import SUPABASE_URL, get_client, reset_client
+from module.db.db_controller import PAGE_SIZE, DBController
+from module.db.read_cache import places_cache, templates_cache
+from schemas.user import UserSchema, InsertUserSchema, UpdateUserSchema
+from schemas.place import PlaceSchema, InsertPlaceSchema
+from schemas.shift import ShiftRecord, InsertShiftSchema, AddShiftResultSchema
+from schemas.template import TemplateSchema, InsertTemplateSchema
+from schemas.dashboard import HomeDashboardSchema
+
+
+SHIFT_COLUMNS = '*, places(name, wage, has_night_wage, closing_day, pay_day)'
+TEMPLATE_COLUMNS = '*, places(name)'
+EXCLUSION_VIOLATION = '23P01'  # シフトの重複(排他制約違反)
+# リクエストを送信する前に失敗した通信エラー(書き込みでも再試行できる)
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def _invalidated() -> dict:
+    """無効化する更新内容(保持期間を数えるため無効化した日時を記録)"""
+    return {'is_valid': False, 'invalidated_at': datetime.now().isoformat(timespec='seconds')}
+
+
+def _reconnecting(idempotent: bool = True) -> Callable:
+    """通信エラーの場合に共有クライアントを作り直し、1回だけ再試行する
+
+    書き込み(idempotent=False)は、リクエストを送信する前に失敗した場合のみ再試行する。
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self: 'SupabaseDBController', *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except httpx.TransportError as e:
+                reset_client(self.supabase)
+                self.supabase = get_client()
+                if not idempotent and not isinstance(e, UNSENT_ERRORS):
+                    raise
+            return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SupabaseDBController(DBController):
+    """Supabase (PostgREST) を使うデータベース操作"""
+    PREFETCH = True  # 通信の待ち時間の間に次のページを取得する
+
+    def __init__(self):
+        self.supabase: Client = get_client()
+
+    @_reconnecting(idempotent=False)
+    def add_user(self, user: InsertUserSchema) -> bool:
+        """ユーザー追加"""
+        response = self.supabase.table('users').select('id').eq('username', user.username).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return False
+
+        insert_response = self.supabase.table('users').insert(user.model_dump()).execute()
+        return bool(insert_response.data)
+
+    @_reconnecting(idempotent=False)
+    def update_user(self, user: UpdateUserSchema) -> bool:
+        """ユーザー情報更新"""
+        response = self.supabase.table('users').select('id').neq('id', user.id).eq('username', user.username).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return False
+
+        self.supabase.table('users').update(user.model_dump()).eq('id', user.id).execute()
+        return True
+
+    @_reconnecting()
+    def get_user(self, id: int) -> UserSchema:
+        """ユーザー情報取得"""
+        response = self.supabase.table('users').select('*').eq('id', id).limit(1).execute()
+        return UserSchema.model_validate(response.data[0])
+
+    @_reconnecting()
+    def login(self, username: str, password: str) -> UserSchema | None:
+        """ユーザーログイン"""
+        response = self.supabase.table('users').select('*').eq('username', username).eq('password', password).eq('is_valid', True).limit(1).execute()
+
+        if response.data:
+            return UserSchema.model_validate(response.data[0])
+        return None
+
+    @_reconnecting(idempotent=False)
+    def add_place(self, place: InsertPlaceSchema) -> PlaceSchema | None:
+        """勤務先追加"""
+        response = self.supabase.table('places').select('id').eq('user_id', place.user_id).eq('name', place.name).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return None
+
+        insert_response = self.supabase.table('places').insert(place.model_dump()).execute()
+        places_cache.invalidate((SUPABASE_URL, place.user_id))
+        return PlaceSchema.model_validate(insert_response.data[0])
+
+    def get_places(self, user_id: int) -> list[PlaceSchema]:
+        """勤務先情報取得(プロセス全体でキャッシュ)"""
+        return places_cache.get((SUPABASE_URL, user_id), lambda: list(self.iter_places(user_id, prefetch=self.PREFETCH)))
+
+    @_reconnecting()
+    def get_places_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[PlaceSchema]:
+        """勤務先情報をID順に1ページ取得"""
+        query = self.supabase.table('places').select('*').eq('user_id', user_id).eq('is_valid', True)
+        if after is not None:
+            query = query.gt('id', after)
+
+        response = query.order('id').limit(limit).execute()
+        return [PlaceSchema.model_validate(place) for place in response.data]
+
+    @_reconnecting()
+    def delete_place(self, id: int) -> bool:
+        """勤務先削除"""
+        response = self.supabase.table('shifts').select('id').eq('place_id', id).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return False
+
+        response = self.supabase.table('templates').select('id').eq('place_id', id).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return False
+
+        response = self.supabase.table('places').update(_invalidated()).eq('id', id).execute()
+        for place in response.data:
+            places_cache.invalidate((SUPABASE_URL, place['user_id']))
+        return True
+
+    @_reconnecting(idempotent=False)
+    def add_shift(self, shift: InsertShiftSchema) -> ShiftRecord | None:
+        """シフト追加
+
+        重複するシフトを確認してから追加し、同時に追加された場合の重複は
+        shifts の排他制約 (sql/create_index.sql) で防ぐ。重複する場合は None を返す。
+        """
+        return self._add_shift(shift).shift
+
+    def _add_shift(self, shift: InsertShiftSchema) -> AddShiftResultSchema:
+        """シフトを1件追加し、追加結果を返す
+
+        is_update なら重複するシフトを無効化してから追加し、追加できなかった場合は元に戻す。
+        """
+        response = (
+            self.supabase.table('shifts')
+            .select('id')
+            .eq('user_id', shift.user_id)
+            .eq('place_id', shift.place_id)
+            .eq('is_valid', True)
+            .gt('end_datetime', shift.start_datetime)
+            .lt('start_datetime', shift.end_datetime)
+            .execute()
+        )
+        replaced_ids = [conflict_shift['id'] for conflict_shift in response.data]
+        if replaced_ids and not shift.is_update:
+            return AddShiftResultSchema()
+
+        if replaced_ids:
+            self._set_shifts_valid(replaced_ids, False)
+
+        try:
+            insert_response = self._returning(self.supabase.table('shifts').insert(shift.model_dump()), SHIFT_COLUMNS).execute()
+        except APIError as e:
+            if replaced_ids:
+                self._set_shifts_valid(replaced_ids, True)
+            if e.code == EXCLUSION_VIOLATION:
+                return AddShiftResultSchema()
+            raise
+
+        return AddShiftResultSchema(shift=self._to_shift_records(insert_response.data)[0], replaced_ids=replaced_ids)
+
+    @_reconnecting(idempotent=False)
+    def add_shifts(self, shifts: list[InsertShiftSchema]) -> list[AddShiftResultSchema]:
+        """シフト一括追加
+
+        重複シフトの取得(ページに分けて全件)、無効化、追加をまとめて行い、
+        各シフトの追加結果(追加されたシフトと置き換えたシフトのID)を入力順に返す。
+        """
+        if not shifts:
+            return []
+
+        existing_shifts = list(self._iter_overlapping_shifts(shifts))
+
+        results, accepted_indexes, delete_target_ids = self._plan_add_shifts(shifts, existing_shifts)
+
+        if delete_target_ids:
+            self._set_shifts_valid(list(delete_target_ids), False)
+
+        if accepted_indexes:
+            try:
+                insert_response = self._returning(
+                    self.supabase.table('shifts').insert([shifts[index].model_dump() for index in accepted_indexes]),
+                    SHIFT_COLUMNS,
+                ).execute()
+            except APIError as e:
+                if delete_target_ids:
+                    self._set_shifts_valid(list(delete_target_ids), True)
+                if e.code != EXCLUSION_VIOLATION:
+                    raise
+
+                # 取得後に他から重複するシフトが追加された場合は1件ずつ追加し直す
+                for index in accepted_indexes:
+                    results[index] = self._add_shift(shifts[index])
+                return results
+
+            for index, inserted_shift in zip(accepted_indexes, self._to_shift_records(insert_response.data)):
+                results[index].shift = inserted_shift
+
+        return results
+
+    def _iter_overlapping_shifts(self, shifts: list[InsertShiftSchema]) -> Iterator[tuple[int, int, int, datetime, datetime]]:
+        """追加するシフト全体の期間と重なる有効なシフトを (id, user_id, place_id, start_datetime, end_datetime) で返す
+
+        PostgREST の取得件数の上限で切り捨てられないよう、ID順に PAGE_SIZE 件ずつのページに分けて取得する。
+        """
+        range_start = min(datetime.fromisoformat(shift.start_datetime) for shift in shifts)
+        range_end = max(datetime.fromisoformat(shift.end_datetime) for shift in shifts)
+
+        after = None
+        while True:
+            query = (
+                self.supabase.table('shifts')
+                .select('id, user_id, place_id, start_datetime, end_datetime')
+                .in_('user_id', list({shift.user_id for shift in shifts}))
+                .in_('place_id', list({shift.place_id for shift in shifts}))
+                .eq('is_valid', True)
+                .gt('end_datetime', range_start.isoformat(timespec='seconds'))
+                .lt('start_datetime', range_end.isoformat(timespec='seconds'))
+            )
+            if after is not None:
+                query = query.gt('id', after)
+
+            response = query.order('id').limit(PAGE_SIZE).execute()
+            for shift in response.data:
+                yield (
+                    shift['id'],
+                    shift['user_id'],
+                    shift['place_id'],
+                    datetime.fromisoformat(shift['start_datetime']),
+                    datetime.fromisoformat(shift['end_datetime']),
+                )
+            if len(response.data) < PAGE_SIZE:
+                return
+            after = response.data[-1]['id']
+
+    def _set_shifts_valid(self, ids: list[int], is_valid: bool) -> None:
+        """シフトを有効化または無効化(置き換えの取り消しにも使う)"""
+        values = {'is_valid': True, 'invalidated_at': None} if is_valid else _invalidated()
+        self.supabase.table('shifts').update(values).in_('id', ids).execute()
+
+    def get_shifts(self, user_id: int, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[ShiftRecord]:
+        """シフト情報取得
+
+        start_datetime, end_datetime を指定した場合は、開始日時が [start_datetime, end_datetime) のシフトのみ取得する。
+        PostgREST の取得件数の上限を超える場合も、ページに分けて全件取得する。
+        """
+        return list(self.iter_shifts(user_id, start_datetime, end_datetime, prefetch=self.PREFETCH))
+
+    @_reconnecting()
+    def get_shifts_page(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None = None,
+        limit: int = PAGE_SIZE,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> list[ShiftRecord]:
+        """シフト情報を (開始日時, ID) 順に1ページ取得"""
+        query = self.supabase.table('shifts').select(SHIFT_COLUMNS).eq('user_id', user_id).eq('is_valid', True)
+        if start_datetime is not None:
+            query = query.gte('start_datetime', start_datetime.isoformat(timespec='seconds'))
+        if end_datetime is not None:
+            query = query.lt('start_datetime', end_datetime.isoformat(timespec='seconds'))
+        if after is not None:
+            after_start = after[0].isoformat(timespec='seconds')
+            query = query.or_(f'start_datetime.gt."{after_start}",and(start_datetime.eq."{after_start}",id.gt.{after[1]})')
+
+        response = query.order('start_datetime').order('id').limit(limit).execute()
+        return self._to_shift_records(response.data)
+
+    @_reconnecting()
+    def delete_shift(self, id: int) -> bool:
+        """シフト削除"""
+        response = self.supabase.table('shifts').update(_invalidated()).eq('id', id).execute()
+        return bool(response.data)
+
+    @_reconnecting()
+    def get_home_dashboard(self, user_id: int, today: datetime) -> HomeDashboardSchema | None:
+        """ホーム画面の集計を取得
+
+        データベース関数 get_home_dashboard (sql/create_function.sql) で集計する。
+        関数が作成されていない場合は None を返す。
+        """
+        try:
+            response = self.supabase.rpc('get_home_dashboard', {
+                'p_user_id': user_id,
+                'p_today': today.isoformat(timespec='seconds'),
+            }).execute()
+        except APIError as e:
+            if e.code == 'PGRST202':  # 関数が存在しない
+                return None
+            raise
+
+        return HomeDashboardSchema.model_validate(response.data)
+
+    @_reconnecting(idempotent=False)
+    def add_template(self, template: InsertTemplateSchema) -> TemplateSchema | None:
+        """テンプレート追加"""
+        response = self.supabase.table('templates').select('id').eq('name', template.name).eq('is_valid', True).limit(1).execute()
+        if response.data:
+            return None
+
+        insert_response = self._returning(self.supabase.table('templates').insert(template.model_dump()), TEMPLATE_COLUMNS).execute()
+        templates_cache.invalidate((SUPABASE_URL, template.user_id))
+        return self._to_template_schemas(insert_response.data)[0]
+
+    def get_templates(self, user_id: int) -> list[TemplateSchema]:
+        """テンプレート情報取得(プロセス全体でキャッシュ)"""
+        return templates_cache.get((SUPABASE_URL, user_id), lambda: list(self.iter_templates(user_id, prefetch=self.PREFETCH)))
+
+    @_reconnecting()
+    def get_templates_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[TemplateSchema]:
+        """テンプレート情報をID順に1ページ取得"""
+        query = self.supabase.table('templates').select(TEMPLATE_COLUMNS).eq('user_id', user_id).eq('is_valid', True)
+        if after is not None:
+            query = query.gt('id', after)
+
+        response = query.order('id').limit(limit).execute()
+        return self._to_template_schemas(response.data)
+
+    @_reconnecting()
+    def delete_template(self, id: int) -> bool:
+        """テンプレート削除"""
+        response = self.supabase.table('templates').update(_invalidated()).eq('id', id).execute()
+        for template in response.data:
+            templates_cache.invalidate((SUPABASE_URL, template['user_id']))
+        return bool(response.data)
+
+    @_reconnecting(idempotent=False)
+    def archive_invalid_rows(self, table: str, before: datetime, batch_size: int) -> int:
+        """無効化されたレコードを退避先のテーブルに batch_size 件まで移動し、移動した件数を返す
+
+        データベース関数 archive_invalid_rows (sql/create_function.sql) で、1回の呼び出しごとに1つのトランザクションで移動する。
+        """
+        response = self.supabase.rpc('archive_invalid_rows', {
+            'p_table': table,
+            'p_before': before.isoformat(timespec='seconds'),
+            'p_batch_size': batch_size,
+        }).execute()
+        return int(response.data or 0)
+
+    def _returning(self, query: SyncQueryRequestBuilder, columns: str) -> SyncQueryRequestBuilder:
+        """追加したレコードを指定した列(結合を含む)で返すように設定"""
+        query.params = query.params.set('select', columns)
+        return query
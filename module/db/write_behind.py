@@ -0,0 +1,491 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, MutableMapping
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from module.core import caliculate_amount
+from module.db.db_controller import PAGE_SIZE, DBController
+from schemas.user import UserSchema, InsertUserSchema, UpdateUserSchema
+from schemas.place import PlaceSchema, InsertPlaceSchema
+from schemas.shift import ShiftRecord, ShiftPlace, InsertShiftSchema, AddShiftResultSchema
+from schemas.template import TemplateSchema, InsertTemplateSchema
+from schemas.dashboard import HomeDashboardSchema
+
+
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', '') == '1'  # 1 のとき書き込みを非同期で反映
+WRITE_BEHIND_PATH = os.getenv('WRITE_BEHIND_PATH', 'write_behind.db')  # 未反映の書き込みを保存するファイル
+
+PROVISIONAL_ID_BASE = 10 ** 15  # 反映前のレコードに割り当てる仮IDの開始値
+FLUSH_INTERVAL = 0.2  # 書き込みをまとめるために待つ秒数
+RETRY_BASE_SECONDS = 1  # 再試行までの待ち時間(失敗のたびに倍増)
+RETRY_MAX_SECONDS = 60  # 再試行までの待ち時間の上限
+MAX_ATTEMPTS = 10  # 書き込みを諦めるまでの試行回数
+RETENTION_SECONDS = 3600  # 取り出されない通知と反映済みの仮IDを保持する秒数
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WriteBehindEvent():
+    """書き込みの反映結果(セッションに通知する)"""
+    kind: str  # resolved: 反映済み, removed: サーバー側で置き換え, rejected: 反映できず
+    key: str  # shifts または templates
+    provisional_id: int | None = None
+    row: ShiftRecord | TemplateSchema | None = None
+    ids: list[int] = field(default_factory=list)
+    message: str | None = None
+
+
+@dataclass
+class _Mutation():
+    """未反映の書き込み"""
+    id: int
+    session_id: str
+    kind: str
+    payload: dict
+    attempts: int
+
+
+class MutationQueue():
+    """未反映の書き込みを SQLite ファイルに保存する永続キュー"""
+
+    def __init__(self, path: str = WRITE_BEHIND_PATH):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS mutations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL DEFAULT 0,
+                in_flight INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS provisional_ids (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                real_id INTEGER,
+                resolved_at REAL
+            );
+        ''')
+        # 以前の形式のファイルに列を追加
+        self._add_column('mutations', 'in_flight', 'INTEGER NOT NULL DEFAULT 0')
+        self._add_column('provisional_ids', 'resolved_at', 'REAL')
+        # 反映中に終了した書き込みは再度反映する
+        with self._connection:
+            self._connection.execute('UPDATE mutations SET in_flight = 0')
+
+    def _add_column(self, table: str, column: str, definition: str) -> None:
+        """列がなければ追加"""
+        columns = [row[1] for row in self._connection.execute(f'PRAGMA table_info({table})')]
+        if column not in columns:
+            with self._connection:
+                self._connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    def new_provisional_id(self) -> int:
+        """仮IDを払い出す"""
+        with self._lock, self._connection:
+            cursor = self._connection.execute('INSERT INTO provisional_ids (real_id) VALUES (NULL)')
+            return PROVISIONAL_ID_BASE + cursor.lastrowid
+
+    def resolve_id(self, id: int) -> int | None:
+        """仮IDを実際のIDに変換(反映されていない場合は None)"""
+        if id < PROVISIONAL_ID_BASE:
+            return id
+
+        with self._lock:
+            row = self._connection.execute('SELECT real_id FROM provisional_ids WHERE id = ?', (id - PROVISIONAL_ID_BASE,)).fetchone()
+        return row[0] if row else None
+
+    def set_real_id(self, provisional_id: int, real_id: int) -> None:
+        """仮IDに実際のIDを対応付ける"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE provisional_ids SET real_id = ?, resolved_at = ? WHERE id = ?',
+                (real_id, time.time(), provisional_id - PROVISIONAL_ID_BASE),
+            )
+
+    def discard_provisional_ids(self, provisional_ids: list[int]) -> None:
+        """反映されなかった追加の仮IDを削除"""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'DELETE FROM provisional_ids WHERE id = ?',
+                [(provisional_id - PROVISIONAL_ID_BASE,) for provisional_id in provisional_ids],
+            )
+
+    def prune(self, before: float) -> None:
+        """before より前に反映済みになった仮IDの対応を削除"""
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM provisional_ids WHERE resolved_at < ?', (before,))
+
+    def enqueue(self, session_id: str, kind: str, payload: dict) -> None:
+        """書き込みを追加"""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT INTO mutations (session_id, kind, payload) VALUES (?, ?, ?)',
+                (session_id, kind, json.dumps(payload)),
+            )
+
+    def cancel_add(self, kind: str, provisional_id: int) -> bool:
+        """未反映の追加を取り消す(追加後すぐに削除された場合の相殺)
+
+        反映中の追加は取り消せないため False を返す(削除は仮IDで別途キューに追加する)。
+        """
+        with self._lock, self._connection:
+            rows = self._connection.execute('SELECT id, payload FROM mutations WHERE kind = ? AND NOT in_flight', (kind,)).fetchall()
+            for id, payload in rows:
+                payload = json.loads(payload)
+                if provisional_id not in payload['provisional_ids']:
+                    continue
+
+                index = payload['provisional_ids'].index(provisional_id)
+                del payload['provisional_ids'][index]
+                del payload['items'][index]
+                if payload['items']:
+                    self._connection.execute('UPDATE mutations SET payload = ? WHERE id = ?', (json.dumps(payload), id))
+                else:
+                    self._connection.execute('DELETE FROM mutations WHERE id = ?', (id,))
+                self._connection.execute('DELETE FROM provisional_ids WHERE id = ?', (provisional_id - PROVISIONAL_ID_BASE,))
+                return True
+
+        return False
+
+    def due(self) -> list[_Mutation]:
+        """反映する時刻になった書き込みを古い順に取得し、反映中にする"""
+        with self._lock, self._connection:
+            rows = self._connection.execute(
+                'SELECT id, session_id, kind, payload, attempts FROM mutations WHERE next_attempt_at <= ? AND NOT in_flight ORDER BY id',
+                (time.time(),),
+            ).fetchall()
+            self._connection.executemany('UPDATE mutations SET in_flight = 1 WHERE id = ?', [(row[0],) for row in rows])
+        return [_Mutation(id, session_id, kind, json.loads(payload), attempts) for id, session_id, kind, payload, attempts in rows]
+
+    def has_pending(self) -> bool:
+        """未反映の書き込みがあるか"""
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM mutations LIMIT 1').fetchone() is not None
+
+    def remove(self, ids: list[int]) -> None:
+        """反映済みの書き込みを削除"""
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM mutations WHERE id = ?', [(id,) for id in ids])
+
+    def retry_later(self, ids: list[int], attempts: int) -> None:
+        """失敗した書き込みの次回試行時刻を設定(指数バックオフ)"""
+        delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'UPDATE mutations SET attempts = ?, next_attempt_at = ?, in_flight = 0 WHERE id = ?',
+                [(attempts, time.time() + delay, id) for id in ids],
+            )
+
+    def release(self, ids: list[int]) -> None:
+        """反映しなかった書き込みを反映中から戻す"""
+        with self._lock, self._connection:
+            self._connection.executemany('UPDATE mutations SET in_flight = 0 WHERE id = ?', [(id,) for id in ids])
+
+
+class WriteBehindWorker(threading.Thread):
+    """キューの書き込みをまとめてデータベースに反映するバックグラウンドスレッド"""
+
+    def __init__(self, queue: MutationQueue, backend_factory: Callable[[], DBController]):
+        super().__init__(name='write-behind', daemon=True)
+        self.queue = queue
+        self._backend_factory = backend_factory
+        self._wakeup = threading.Event()
+        self._events_lock = threading.Lock()
+        self._events: dict[str, list[WriteBehindEvent]] = {}
+        self._event_times: dict[str, float] = {}  # セッションごとの最後に通知を追加した時刻
+
+    def notify(self) -> None:
+        """書き込みが追加されたことを通知"""
+        self._wakeup.set()
+
+    def pop_events(self, session_id: str) -> list[WriteBehindEvent]:
+        """セッションへの通知を取り出す"""
+        with self._events_lock:
+            self._event_times.pop(session_id, None)
+            return self._events.pop(session_id, [])
+
+    def run(self) -> None:
+        backend = self._backend_factory()
+        while True:
+            self._wakeup.wait(RETRY_BASE_SECONDS)
+            self._wakeup.clear()
+            time.sleep(FLUSH_INTERVAL)  # 続けて行われた書き込みをまとめる
+            self.flush(backend)
+
+    def flush(self, backend: DBController) -> None:
+        """反映する時刻になった書き込みをまとめて反映
+
+        取得した書き込みは反映中になり、反映を終えるまで cancel_add で取り消されない。
+        """
+        groups = _coalesce(self.queue.due())
+        for index, mutations in enumerate(groups):
+            try:
+                self._apply(backend, mutations)
+            except Exception:
+                attempts = max(mutation.attempts for mutation in mutations) + 1
+                logger.exception('write-behind flush failed (attempt %d)', attempts)
+                if attempts < MAX_ATTEMPTS:
+                    self.queue.retry_later([mutation.id for mutation in mutations], attempts)
+                    # 順序を保つため、以降の書き込みは次回に回す
+                    self.queue.release([mutation.id for rest in groups[index + 1:] for mutation in rest])
+                    break
+
+                self._reject_all(mutations)
+
+            self.queue.remove([mutation.id for mutation in mutations])
+
+        self.prune()
+
+    def prune(self) -> None:
+        """取り出されない通知と、反映済みになってから時間が経った仮IDの対応を削除"""
+        before = time.time() - RETENTION_SECONDS
+        self.queue.prune(before)
+        with self._events_lock:
+            for session_id in [session_id for session_id, pushed_at in self._event_times.items() if pushed_at < before]:
+                del self._events[session_id]
+                del self._event_times[session_id]
+
+    def _apply(self, backend: DBController, mutations: list['_Mutation']) -> None:
+        """書き込みを反映し、結果をセッションに通知"""
+        kind = mutations[0].kind
+
+        if kind == 'add_shifts':
+            items = [(mutation.session_id, provisional_id, item) for mutation in mutations for provisional_id, item in zip(mutation.payload['provisional_ids'], mutation.payload['items'])]
+            results = backend.add_shifts([InsertShiftSchema(**item) for _, _, item in items])
+            for (session_id, provisional_id, _), result in zip(items, results):
+                self._notify_add_result(session_id, 'shifts', provisional_id, result.shift, 'その時間はシフトが既に存在します')
+                if result.replaced_ids:
+                    self._push(session_id, WriteBehindEvent('removed', 'shifts', ids=result.replaced_ids))
+
+        elif kind == 'add_template':
+            for mutation in mutations:
+                item = mutation.payload['items'][0]
+                template = backend.add_template(InsertTemplateSchema(**item))
+                self._notify_add_result(mutation.session_id, 'templates', mutation.payload['provisional_ids'][0], template, f"名称{item['name']}は既に存在します")
+
+        else:
+            delete = backend.delete_shift if kind == 'delete_shift' else backend.delete_template
+            for mutation in mutations:
+                id = self.queue.resolve_id(mutation.payload['id'])
+                if id is not None:  # 追加が反映されなかった場合は削除も不要
+                    delete(id)
+
+    def _notify_add_result(self, session_id: str, key: str, provisional_id: int, row: ShiftRecord | TemplateSchema | None, message: str) -> None:
+        """追加の結果を通知"""
+        if row is None:
+            self.queue.discard_provisional_ids([provisional_id])
+            self._push(session_id, WriteBehindEvent('rejected', key, provisional_id, message=message))
+        else:
+            self.queue.set_real_id(provisional_id, row.id)
+            self._push(session_id, WriteBehindEvent('resolved', key, provisional_id, row=row))
+
+    def _reject_all(self, mutations: list['_Mutation']) -> None:
+        """反映を諦めた書き込みを通知
+
+        削除の場合はセッションから既に取り除いているため、ids に削除できなかったIDを入れて通知する。
+        """
+        for mutation in mutations:
+            key = 'shifts' if 'shift' in mutation.kind else 'templates'
+            if mutation.kind.startswith('delete'):
+                self._push(mutation.session_id, WriteBehindEvent('rejected', key, ids=[mutation.payload['id']], message='削除をデータベースに反映できませんでした'))
+                continue
+
+            self.queue.discard_provisional_ids(mutation.payload['provisional_ids'])
+            for provisional_id in mutation.payload['provisional_ids']:
+                self._push(mutation.session_id, WriteBehindEvent('rejected', key, provisional_id, message='データベースに反映できませんでした'))
+
+    def _push(self, session_id: str, event: WriteBehindEvent) -> None:
+        """セッションへの通知を追加"""
+        with self._events_lock:
+            self._events.setdefault(session_id, []).append(event)
+            self._event_times[session_id] = time.time()
+
+
+def _coalesce(mutations: list[_Mutation]) -> list[list[_Mutation]]:
+    """連続するシフト追加を1回の一括追加にまとめる"""
+    groups: list[list[_Mutation]] = []
+    for mutation in mutations:
+        if groups and mutation.kind == 'add_shifts' and groups[-1][0].kind == 'add_shifts':
+            groups[-1].append(mutation)
+        else:
+            groups.append([mutation])
+    return groups
+
+
+_worker_lock = threading.Lock()
+_worker: WriteBehindWorker | None = None
+
+
+def get_worker(backend_factory: Callable[[], DBController]) -> WriteBehindWorker:
+    """プロセス共有のワーカーを取得(初回呼び出し時に起動)"""
+    global _worker
+
+    with _worker_lock:
+        if _worker is None:
+            _worker = WriteBehindWorker(MutationQueue(), backend_factory)
+            _worker.start()
+        return _worker
+
+
+class WriteBehindDBController(DBController):
+    """シフト・テンプレートの追加と削除を非同期で反映するデータベース操作
+
+    書き込みはセッションのデータで検証して仮IDのレコードをすぐに返し、
+    永続キューに保存してバックグラウンドでまとめて反映する。
+    読み込みと勤務先・ユーザーの操作は backend でそのまま実行する。
+    """
+
+    def __init__(self, backend: DBController, worker: WriteBehindWorker, session_id: str, session_state: MutableMapping):
+        self.backend = backend
+        self.worker = worker
+        self.session_id = session_id
+        self.session_state = session_state
+
+    def pop_events(self) -> list[WriteBehindEvent]:
+        """反映結果の通知を取り出す"""
+        return self.worker.pop_events(self.session_id)
+
+    def add_user(self, user: InsertUserSchema) -> bool:
+        return self.backend.add_user(user)
+
+    def update_user(self, user: UpdateUserSchema) -> bool:
+        return self.backend.update_user(user)
+
+    def get_user(self, id: int) -> UserSchema:
+        return self.backend.get_user(id)
+
+    def login(self, username: str, password: str) -> UserSchema | None:
+        return self.backend.login(username, password)
+
+    def add_place(self, place: InsertPlaceSchema) -> PlaceSchema | None:
+        return self.backend.add_place(place)
+
+    def get_places(self, user_id: int) -> list[PlaceSchema]:
+        return self.backend.get_places(user_id)
+
+    def get_places_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[PlaceSchema]:
+        return self.backend.get_places_page(user_id, after, limit)
+
+    def delete_place(self, id: int) -> bool:
+        return self.backend.delete_place(id)
+
+    def add_shift(self, shift: InsertShiftSchema) -> ShiftRecord | None:
+        """シフト追加(非同期)"""
+        return self.add_shifts([shift])[0].shift
+
+    def add_shifts(self, shifts: list[InsertShiftSchema]) -> list[AddShiftResultSchema]:
+        """シフト一括追加(非同期)
+
+        重複の判定はセッションのシフトで行う。サーバー側での結果が異なる場合は
+        反映後に WriteBehindEvent で通知する。
+        """
+        existing_shifts = [
+            (shift.id, shift.user_id, shift.place_id, shift.start_datetime, shift.end_datetime)
+            for shift in self.session_state.get('shifts', [])
+        ]
+        results, accepted_indexes, _ = self._plan_add_shifts(shifts, existing_shifts)
+        if not accepted_indexes:
+            return results
+
+        places = {place.id: place for place in self.session_state['places']}
+        provisional_ids = []
+        for index in accepted_indexes:
+            provisional_id = self.worker.queue.new_provisional_id()
+            results[index].shift = _to_provisional_shift(provisional_id, shifts[index], places[shifts[index].place_id])
+            provisional_ids.append(provisional_id)
+
+        self._enqueue('add_shifts', {
+            'provisional_ids': provisional_ids,
+            'items': [{**shifts[index].model_dump(), 'is_update': shifts[index].is_update} for index in accepted_indexes],
+        })
+        return results
+
+    def get_shifts(self, user_id: int, start_datetime: datetime | None = None, end_datetime: datetime | None = None) -> list[ShiftRecord]:
+        return self.backend.get_shifts(user_id, start_datetime, end_datetime)
+
+    def get_shifts_page(
+        self,
+        user_id: int,
+        after: tuple[datetime, int] | None = None,
+        limit: int = PAGE_SIZE,
+        start_datetime: datetime | None = None,
+        end_datetime: datetime | None = None,
+    ) -> list[ShiftRecord]:
+        return self.backend.get_shifts_page(user_id, after, limit, start_datetime, end_datetime)
+
+    def delete_shift(self, id: int) -> bool:
+        """シフト削除(非同期)"""
+        if not self.worker.queue.cancel_add('add_shifts', id):
+            self._enqueue('delete_shift', {'id': id})
+        return True
+
+    def get_home_dashboard(self, user_id: int, today: datetime) -> HomeDashboardSchema | None:
+        if self.worker.queue.has_pending():
+            return None  # 未反映の書き込みがある間はセッションのデータで集計する
+        return self.backend.get_home_dashboard(user_id, today)
+
+    def add_template(self, template: InsertTemplateSchema) -> TemplateSchema | None:
+        """テンプレート追加(非同期)"""
+        if any(session_template.name == template.name for session_template in self.session_state.get('templates', [])):
+            return None
+
+        place = next(place for place in self.session_state['places'] if place.id == template.place_id)
+        provisional_id = self.worker.queue.new_provisional_id()
+        self._enqueue('add_template', {'provisional_ids': [provisional_id], 'items': [template.model_dump()]})
+
+        return TemplateSchema(
+            id=provisional_id,
+            user_id=template.user_id,
+            place_id=template.place_id,
+            name=template.name,
+            start_time=template.start_time,
+            end_time=template.end_time,
+            break_time=template.break_time,
+            place=place.name,
+        )
+
+    def get_templates(self, user_id: int) -> list[TemplateSchema]:
+        return self.backend.get_templates(user_id)
+
+    def get_templates_page(self, user_id: int, after: int | None = None, limit: int = PAGE_SIZE) -> list[TemplateSchema]:
+        return self.backend.get_templates_page(user_id, after, limit)
+
+    def delete_template(self, id: int) -> bool:
+        """テンプレート削除(非同期)"""
+        if not self.worker.queue.cancel_add('add_template', id):
+            self._enqueue('delete_template', {'id': id})
+        return True
+
+    def archive_invalid_rows(self, table: str, before: datetime, batch_size: int) -> int:
+        return self.backend.archive_invalid_rows(table, before, batch_size)
+
+    def _enqueue(self, kind: str, payload: dict) -> None:
+        """キューに追加してワーカーに通知"""
+        self.worker.queue.enqueue(self.session_id, kind, payload)
+        self.worker.notify()
+
+
+def _to_provisional_shift(provisional_id: int, shift: InsertShiftSchema, place: PlaceSchema) -> ShiftRecord:
+    """反映前のシフトを仮IDで作成"""
+    start_datetime = datetime.fromisoformat(shift.start_datetime)
+    end_datetime = datetime.fromisoformat(shift.end_datetime)
+    break_time = datetime.strptime(shift.break_time, '%H:%M:%S').time()
+
+    return ShiftRecord(
+        provisional_id,
+        shift.user_id,
+        shift.place_id,
+        start_datetime,
+        end_datetime,
+        break_time,
+        caliculate_amount(start_datetime, end_datetime, break_time, place.wage, place.has_night_wage),
+        ShiftPlace.get(place.name, place.wage, place.has_night_wage, place.closing_day, place.pay_day),
+    )
@@ -0,0 +1,2 @@
+from .recorder import METRICS, RerunMetrics, Span, start_rerun, finish_rerun, span, record_round_trip, get_summary
+from .sidebar import show_metrics_sidebar
\ No newline at end of file
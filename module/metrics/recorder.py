@@ -0,0 +1,156 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+METRICS = os.getenv('METRICS', '') == '1'  # 1 のとき再実行ごとの計測結果を記録
+METRICS_SAMPLE_SIZE = 1000  # 処理ごとに p50/p95 の計算に使う直近の件数
+
+logger = logging.getLogger('shift_app.metrics')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Span():
+    """1つの処理の計測結果"""
+
+    def __init__(self, name: str, parent: 'Span | None'):
+        self.name = name
+        self.parent = parent
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.bytes = 0
+        self.rows: int | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            'name': self.name,
+            'seconds': round(self.seconds, 6),
+            'round_trips': self.round_trips,
+            'bytes': self.bytes,
+            'rows': self.rows,
+        }
+
+
+class RerunMetrics():
+    """1回の再実行の計測結果"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.seconds = 0.0
+        self.round_trips = 0
+        self.bytes = 0
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        return {
+            'started_at': self.started_at,
+            'seconds': round(self.seconds, 6),
+            'round_trips': self.round_trips,
+            'bytes': self.bytes,
+            'spans': [span.to_dict() for span in self.spans],
+        }
+
+
+_current_rerun: ContextVar[RerunMetrics | None] = ContextVar('current_rerun', default=None)
+_current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+
+_samples_lock = threading.Lock()
+_samples: dict[str, deque[float]] = {}
+
+
+def start_rerun() -> RerunMetrics | None:
+    """再実行の計測を開始(METRICS が無効の場合は None)"""
+    if not METRICS:
+        return None
+
+    metrics = RerunMetrics()
+    _current_rerun.set(metrics)
+    _current_span.set(None)
+    return metrics
+
+
+def finish_rerun(metrics: RerunMetrics | None) -> None:
+    """再実行の計測を終了し、JSON でログに出力してプロセスの集計に加える"""
+    if metrics is None:
+        return
+
+    _current_rerun.set(None)
+    metrics.seconds = time.time() - metrics.started_at
+    logger.info(json.dumps({'event': 'rerun', **metrics.to_dict()}, ensure_ascii=False))
+
+    _add_sample('rerun', metrics.seconds)
+    for span in metrics.spans:
+        _add_sample(span.name, span.seconds)
+
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """処理時間と、その間の通信回数・バイト数を計測"""
+    metrics = _current_rerun.get()
+    current = Span(name, _current_span.get())
+    if metrics is None:
+        yield current
+        return
+
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        _current_span.reset(token)
+        metrics.add_span(current)
+
+
+def record_round_trip(size: int = 0) -> None:
+    """データベースとの通信1回を記録"""
+    metrics = _current_rerun.get()
+    if metrics is None:
+        return
+
+    with metrics._lock:
+        metrics.round_trips += 1
+        metrics.bytes += size
+        current = _current_span.get()
+        while current is not None:
+            current.round_trips += 1
+            current.bytes += size
+            current = current.parent
+
+
+def get_summary() -> dict[str, dict[str, float]]:
+    """処理ごとの件数と p50/p95 (秒) をプロセス全体で集計"""
+    with _samples_lock:
+        samples = {name: sorted(values) for name, values in _samples.items()}
+
+    return {
+        name: {'count': len(values), 'p50': _percentile(values, 0.5), 'p95': _percentile(values, 0.95)}
+        for name, values in sorted(samples.items())
+    }
+
+
+def _add_sample(name: str, seconds: float) -> None:
+    """処理時間をプロセスの集計に加える"""
+    with _samples_lock:
+        _samples.setdefault(name, deque(maxlen=METRICS_SAMPLE_SIZE)).append(seconds)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """並べ替え済みの値のパーセンタイル(最近傍)"""
+    return values[min(len(values) - 1, int(q * len(values)))]
@@ -0,0 +1,37 @@
+import streamlit as st
+
+from module.metrics.recorder import METRICS, RerunMetrics, get_summary
+
+
+def show_metrics_sidebar(metrics: RerunMetrics | None) -> None:
+    """計測結果をサイドバーに表示(チェックを入れた場合のみ)"""
+    if not METRICS or metrics is None:
+        return
+
+    if not st.sidebar.checkbox('計測結果を表示', key='show_metrics'):
+        return
+
+    with st.sidebar.expander('今回の再実行', expanded=True):
+        st.write(f'{metrics.seconds * 1000:.1f} ms / 通信 {metrics.round_trips} 回 / {metrics.bytes:,} bytes')
+        st.dataframe(
+            [
+                {
+                    '処理': span.name,
+                    'ms': round(span.seconds * 1000, 1),
+                    '通信': span.round_trips,
+                    'bytes': span.bytes,
+                    '件数': span.rows,
+                }
+                for span in metrics.spans
+            ],
+            hide_index=True,
+        )
+
+    with st.sidebar.expander('プロセス全体'):
+        st.dataframe(
+            [
+                {'処理': name, '回数': summary['count'], 'p50 ms': round(summary['p50'] * 1000, 1), 'p95 ms': round(summary['p95'] * 1000, 1)}
+                for name, summary in get_summary().items()
+            ],
+            hide_index=True,
+        )
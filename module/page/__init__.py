@@ -1,7 +1,35 @@
-from .home import show_home_page
-from .place import show_place_page
-from .shift import show_shift_page
-from .template import show_template_page
-from .setting import show_setting_page
-from .login import show_login_page
-from .create_acount import show_create_account_page
+from collections.abc import Callable
+from importlib import import_module
+
+
+# メニュー名と表示関数('モジュール名:関数名')の対応
+# 表示関数は選択されたときに初めてモジュールごと読み込む
+AUTHENTICATED_PAGES = {
+    'ホーム': 'home:show_home_page',
+    '勤務先': 'place:show_place_page',
+    'シフト': 'shift:show_shift_page',
+    'テンプレート': 'template:show_template_page',
+    '設定': 'setting:show_setting_page',
+}
+ANONYMOUS_PAGES = {
+    'ログイン': 'login:show_login_page',
+    'アカウント作成': 'create_acount:show_create_account_page',
+}
+
+_PAGE_FUNCTIONS = {
+    target.split(':')[1]: target
+    for target in [*AUTHENTICATED_PAGES.values(), *ANONYMOUS_PAGES.values()]
+}
+
+
+def load_page(target: str) -> Callable:
+    """表示関数を読み込む"""
+    module_name, function_name = target.split(':')
+    return getattr(import_module(f'{__name__}.{module_name}'), function_name)
+
+
+def __getattr__(name: str) -> Callable:
+    """from module.page import show_home_page のような読み込みにも対応"""
+    if name in _PAGE_FUNCTIONS:
+        return load_page(_PAGE_FUNCTIONS[name])
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
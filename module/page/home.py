@@ -1,77 +1,43 @@
-import calendar
 from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
 
-import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
+from matplotlib.figure import Figure
 import pandas as pd
 import streamlit as st
 
+from module.core.payroll_period import get_current_period
+from module.core.shift_index import ShiftIndex
 from module.db import DBController
-from schemas.shift import ShiftSchema
+from module.metrics import span
+from module.state import get_version, get_shift_index, get_payroll_history
+from schemas.dashboard import HomeDashboardSchema, PlaceDashboardSchema
 
 
 LIMIT_AMOUNT = 1_030_000  # 限度額
 PIE_FONTPATH = './fonts/msgothic.ttc'  # 円グラフのフォントパス
+PIE_CACHE_SIZE = 128  # 円グラフの画像を保持する件数
 
 
-def show_home_page(_) -> None:
+def show_home_page(db: DBController) -> None:
     """ホームページを表示"""
-    session_shifts: list[ShiftSchema] = st.session_state['shifts']
-
     today = datetime.today()
-
-    # メイン情報
-    start_datetime, end_datetime = _get_date_period(today, 31)
-    current_amount = _caliculate_amount(session_shifts, start_datetime, today)
-    year_amount = _caliculate_amount(session_shifts, datetime(today.year, 1, 1, 0, 0, 0), today)
-    next_shift = _get_next_shift(session_shifts, today)
+    dashboard = _get_dashboard(db, today)
 
     # 勤務先情報
-    if session_shifts:
-        place_infos = []
-
-        shift_df = pd.DataFrame([
+    if dashboard.places:
+        place_df = pd.DataFrame([
             {
-                'place_id': shift.place_id,
-                'place': shift.place,
-                'amount': shift.amount,
-                'start_datetime': shift.start_datetime,
-                'end_datetime': shift.end_datetime,
-                'closing_day': shift.closing_day,
-                'pay_day': shift.pay_day,
+                '勤務先名': place_info.place,
+                '締め日までの見込額': f'{place_info.amount:,}円',
+                '次回出勤日': place_info.next_shift.strftime('%Y/%m/%d') if place_info.next_shift else 'なし',
+                '締め日まで': f'{place_info.to_closing_day}日',
+                '給料日まで': f'{place_info.to_pay_day}日',
             }
-            for shift in session_shifts
+            for place_info in dashboard.places
         ])
 
-        for place, grouped_df in shift_df.groupby('place'):
-            place_id = grouped_df.place_id.iloc[0]
-            place_closing_day = grouped_df.closing_day.iloc[0]
-            place_pay_day = grouped_df.pay_day.iloc[0]
-
-            place_start_datetime, place_end_datetime = _get_date_period(today, place_closing_day)
-            to_closing_day = (place_end_datetime - today).days
-
-            mask = (place_start_datetime < grouped_df['end_datetime']) & (grouped_df['end_datetime'] <= place_end_datetime)
-            place_amount = grouped_df.loc[mask, 'amount'].sum()
-
-            if place_amount == 0:
-                continue
-
-            _, place_end_datetime = _get_date_period(today, place_pay_day)
-            to_pay_day = (place_end_datetime - today).days
-
-            place_next_shift = _get_next_shift(session_shifts, today, place_id)
-
-            place_infos.append({
-                '勤務先名': place,
-                '締め日までの見込額': f'{place_amount:,}円',
-                '次回出勤日': place_next_shift.strftime('%Y/%m/%d') if place_next_shift else 'なし',
-                '締め日まで': f'{to_closing_day}日',
-                '給料日まで': f'{to_pay_day}日',
-            })
-
-        place_df = pd.DataFrame(place_infos)
-
     st.subheader('ホーム')
 
     if st.button('ログアウト', type='primary', key='logout_btn'):
@@ -79,108 +45,154 @@ def show_home_page(_) -> None:
         st.rerun()
 
     _display_pie_chart(
-        current_amount,
+        dashboard.current_amount,
         st.session_state['user'].goal_amount,
-        start_datetime,
-        end_datetime,
+        dashboard.start_datetime,
+        dashboard.end_datetime,
         PIE_FONTPATH,
     )
 
     st.markdown(
-        f'<div style="text-align: center; font-size: 28px; font-weight: bold;">{LIMIT_AMOUNT:,}円まで残り{LIMIT_AMOUNT - year_amount:,}円</div>',
+        f'<div style="text-align: center; font-size: 28px; font-weight: bold;">{LIMIT_AMOUNT:,}円まで残り{LIMIT_AMOUNT - dashboard.year_amount:,}円</div>',
         unsafe_allow_html=True
     )
 
-    if next_shift is None:
+    if dashboard.next_shift is None:
         st.markdown(
             '<div style="text-align: center; font-size: 28px; font-weight: bold;">次回の出勤予定なし</div>',
             unsafe_allow_html=True
         )
     else:
         st.markdown(
-            f'<div style="text-align: center; font-size: 28px; font-weight: bold;">次回の出勤日は{next_shift.strftime("%Y/%m/%d")}</div>',
+            f'<div style="text-align: center; font-size: 28px; font-weight: bold;">次回の出勤日は{dashboard.next_shift.strftime("%Y/%m/%d")}</div>',
             unsafe_allow_html=True
         )
 
-    if session_shifts:
+    if dashboard.places:
         st.write('')
         st.dataframe(place_df, use_container_width=True, hide_index=True)
 
+    _display_payroll_history(db)
+
+
+def _display_payroll_history(db: DBController) -> None:
+    """読み込み済みの期間の勤務先・締め期間ごとの給料の一覧を表示"""
+    history = get_payroll_history(db)
+    if history.empty:
+        return
+
+    with st.expander('給料履歴'):
+        st.dataframe(
+            pd.DataFrame({
+                '締め期間': history['period_start'].dt.strftime('%Y/%m/%d') + ' - ' + history['period_end'].dt.strftime('%Y/%m/%d'),
+                '勤務先名': history['place'],
+                '給料日': history['pay_date'].dt.strftime('%Y/%m/%d'),
+                '金額': history['amount'].map('{:,}円'.format),
+                '勤務数': history['shift_count'],
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
 
-def _get_date_period(today: datetime, closing_day: int) -> tuple[datetime, datetime]:
-    """指定された締め日から、開始日と終了日を計算"""
-    year = today.year
-    month = today.month
-
-    if today.day <= closing_day:
-        last_day_this_month = calendar.monthrange(year, month)[1]
-        end_day = min(closing_day, last_day_this_month)
-        end_datetime = datetime(today.year, today.month, end_day, 23, 59, 59)
-
-        if month == 1:
-            prev_year = year - 1
-            prev_month = 12
-        else:
-            prev_year = year
-            prev_month = month - 1
-
-        last_day_prev_month = calendar.monthrange(prev_year, prev_month)[1]
 
-        if closing_day + 1 > last_day_prev_month:
-            start_month = month
-            start_day = 1
-        else:
-            start_month = prev_month
-            start_day = closing_day + 1
+def _get_dashboard(db: DBController, today: datetime) -> HomeDashboardSchema:
+    """ホーム画面の集計を取得
 
-        start_datetime = datetime(prev_year, start_month, start_day, 0, 0, 0)
-    else:
-        last_day_this_month = calendar.monthrange(year, month)[1]
-        start_day = min(closing_day + 1, last_day_this_month)
-        start_datetime = datetime(year, month, start_day, 0, 0, 0)
+    シフトが変更されるか時刻(分)が変わるまでは、前回の集計結果を再利用する。
+    データベース関数が使えない場合はセッションのシフトの索引から集計する。
+    """
+    cache_key = (get_version('shifts'), today.strftime('%Y%m%d%H%M'))
+    cached = st.session_state.get('home_dashboard')
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
 
-        if month == 12:
-            next_year = year + 1
-            next_month = 1
-        else:
-            next_year = year
-            next_month = month + 1
+    dashboard = db.get_home_dashboard(st.session_state['user_id'], today)
+    if dashboard is None:
+        dashboard = _build_dashboard(get_shift_index(), today)
 
-        last_day_next_month = calendar.monthrange(next_year, next_month)[1]
-        end_day = min(closing_day, last_day_next_month)
-        end_datetime = datetime(next_year, next_month, end_day, 23, 59, 59)
+    st.session_state['home_dashboard'] = (cache_key, dashboard)
+    return dashboard
 
-    return start_datetime, end_datetime
 
+def _build_dashboard(shift_index: ShiftIndex, today: datetime) -> HomeDashboardSchema:
+    """シフトの索引からホーム画面の集計を作成"""
+    # メイン情報
+    start_datetime, end_datetime = get_current_period(today, 31)
+    current_amount = shift_index.sum_amount(start_datetime, today)
+    year_amount = shift_index.sum_amount(datetime(today.year, 1, 1, 0, 0, 0), today)
+    next_shift = shift_index.next_shift(today)
 
-def _caliculate_amount(shifts: list[ShiftSchema], start_datetime: datetime, end_datetime: datetime) -> int:
-    """指定された期間の金額を計算"""
-    amount = 0
-    for shift in shifts:
-        if start_datetime < shift.end_datetime <= end_datetime:
-            amount += shift.amount
+    # 勤務先情報
+    place_infos = []
+    for place_id, place_shift in sorted(shift_index.places.items(), key=lambda item: item[1].place):
+        place_start_datetime, place_end_datetime = get_current_period(today, place_shift.closing_day)
+        to_closing_day = (place_end_datetime - today).days
+
+        place_amount = shift_index.sum_amount(place_start_datetime, place_end_datetime, place_id)
+
+        if place_amount == 0:
+            continue
+
+        _, place_end_datetime = get_current_period(today, place_shift.pay_day)
+        to_pay_day = (place_end_datetime - today).days
+
+        place_infos.append(PlaceDashboardSchema(
+            place_id=place_id,
+            place=place_shift.place,
+            amount=place_amount,
+            next_shift=shift_index.next_shift(today, place_id),
+            to_closing_day=to_closing_day,
+            to_pay_day=to_pay_day,
+        ))
+
+    return HomeDashboardSchema(
+        start_datetime=start_datetime,
+        end_datetime=end_datetime,
+        current_amount=current_amount,
+        year_amount=year_amount,
+        next_shift=next_shift,
+        places=place_infos,
+    )
 
-    return amount
 
+def _display_pie_chart(
+    current_amount: int,
+    goal_amount: int,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    pie_fontpath: str,
+) -> None:
+    """円グラフを表示"""
+    st.image(
+        _render_pie_chart(current_amount, goal_amount, start_datetime, end_datetime, pie_fontpath),
+        use_container_width=True,
+    )
 
-def _get_next_shift(shifts: list[ShiftSchema], today: datetime, place_id: int = None) -> datetime | None:
-    """次回の出勤日を取得"""
-    for shift in shifts:
-        if place_id is None or shift.place_id == place_id:
-            if shift.start_datetime > today:
-                return shift.start_datetime
 
-    return None
+@lru_cache(maxsize=PIE_CACHE_SIZE)
+def _render_pie_chart(
+    current_amount: int,
+    goal_amount: int,
+    start_datetime: datetime,
+    end_datetime: datetime,
+    pie_fontpath: str,
+) -> bytes:
+    """円グラフを PNG 画像として描画(同じ金額・期間の画像は再利用する)"""
+    with span('render_pie_chart'):
+        return _draw_pie_chart(current_amount, goal_amount, start_datetime, end_datetime, pie_fontpath)
 
 
-def _display_pie_chart(
+def _draw_pie_chart(
     current_amount: int,
     goal_amount: int,
     start_datetime: datetime,
     end_datetime: datetime,
     pie_fontpath: str,
-) -> None:
-    """円グラフを表示"""
+) -> bytes:
+    """円グラフを描画して PNG 画像のバイト列を返す
+
+    pyplot のグローバルな状態は使わず、描画ごとに作成した Figure は画像に変換した後に閉じる。
+    """
     achievement_rate = (current_amount / goal_amount) * 100
 
     achievement_rate = 100 if achievement_rate > 100 else achievement_rate
@@ -189,14 +201,27 @@ def _display_pie_chart(
     colors = ['#52b338', '#e2e9d9']
     wedge = {'width' : 0.1}
 
-    plt.pie(sizes, colors=colors, wedgeprops=wedge, startangle=90, counterclock=False)
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+        ax.pie(sizes, colors=colors, wedgeprops=wedge, startangle=90, counterclock=False)
+
+        font_prop = _load_font(pie_fontpath)
+
+        ax.text(0, 0.5, f"{start_datetime.strftime('%Y/%m/%d')} - {end_datetime.strftime('%Y/%m/%d')}", fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
+        ax.text(0, 0.35, f'目標金額 {goal_amount:,}円', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
+        ax.text(0, 0, '今日までの給料', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
+        ax.text(0, -0.2, f'{current_amount:,}円', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=20)
+
+        image = BytesIO()
+        fig.savefig(image, bbox_inches='tight', dpi=200, format='png')
+    finally:
+        fig.clear()
 
-    fontpath = pie_fontpath
-    font_prop = fm.FontProperties(fname=fontpath)
+    return image.getvalue()
 
-    plt.text(0, 0.5, f"{start_datetime.strftime('%Y/%m/%d')} - {end_datetime.strftime('%Y/%m/%d')}", fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
-    plt.text(0, 0.35, f'目標金額 {goal_amount:,}円', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
-    plt.text(0, 0, '今日までの給料', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=10)
-    plt.text(0, -0.2, f'{current_amount:,}円', fontproperties=font_prop, horizontalalignment='center', verticalalignment='center', fontsize=20)
 
-    st.pyplot(plt)
+@lru_cache(maxsize=None)
+def _load_font(pie_fontpath: str) -> fm.FontProperties:
+    """円グラフのフォントを読み込む(プロセスで1度だけ)"""
+    return fm.FontProperties(fname=pie_fontpath)
@@ -1,6 +1,9 @@
+from datetime import datetime
+
 import streamlit as st
 
 from module.db import DBController
+from module.state import load_user_data
 
 
 def show_login_page(db: DBController) -> None:
@@ -22,9 +25,7 @@ def show_login_page(db: DBController) -> None:
                 if user is not None:
                     st.session_state['user_id'] = user.id
                     st.session_state['user'] = user
-                    st.session_state['places'] = db.get_places(user.id)
-                    st.session_state['shifts'] = db.get_shifts(user.id)
-                    st.session_state['templates'] = db.get_templates(user.id)
+                    load_user_data(db, user.id, datetime.today())
                     st.rerun()
                 else:
                     st.error('ユーザー名またはパスワードが間違っています')
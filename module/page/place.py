@@ -3,6 +3,7 @@ import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder
 
 from module.db import DBController
+from module.state import insert_items, remove_items
 from schemas.place import PlaceSchema, InsertPlaceSchema
 
 
@@ -72,8 +73,9 @@ def _show_add_form(db: DBController) -> None:
                     pay_day=pay_day,
                 )
 
-                if db.add_place(insert_place):
-                    st.session_state['places'] = db.get_places(st.session_state['user_id'])
+                added_place = db.add_place(insert_place)
+                if added_place is not None:
+                    insert_items('places', [added_place])
                     st.rerun()
                 else:
                     st.error(f'勤務先{name}は既に存在します')
@@ -90,7 +92,7 @@ def _show_detail(place: PlaceSchema, db: DBController) -> None:
 
     if st.button('削除', type='primary', key='delete_btn'):
         if db.delete_place(place.id):
-            st.session_state['places'] = db.get_places(st.session_state['user_id'])
+            remove_items('places', [place.id])
             st.rerun()
         else:
             st.error('勤務先に紐づくシフトまたはテンプレートが存在します')
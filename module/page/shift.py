@@ -1,30 +1,38 @@
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta
 
 import streamlit as st
 import streamlit_calendar as st_calendar
 
 from module.db import DBController
+from module.state import insert_items, remove_items, reload_items, ensure_shifts_loaded, get_version, get_shift_table, get_shift_intervals, find_shift
+from module.transfer import EXPORT_FORMATS, ImportProgress, export_shifts, import_shifts
 from schemas.place import PlaceSchema
-from schemas.shift import ShiftSchema, InsertShiftSchema
+from schemas.shift import ShiftRecord, InsertShiftSchema
 from schemas.template import TemplateSchema
 
 
+CALENDAR_MARGIN_DAYS = 7  # 月表示で前後の月にはみ出して表示される日数
+
+
 def show_shift_page(db: DBController) -> None:
     """シフトページを表示"""
-    session_shifts: list[ShiftSchema] = st.session_state['shifts']
+    if 'calendar_month' not in st.session_state:
+        today = datetime.today()
+        st.session_state['calendar_month'] = datetime(today.year, today.month, 1)
+
+    calendar_month: datetime = st.session_state['calendar_month']
+    ensure_shifts_loaded(db, *_get_visible_range(calendar_month))
+
     session_templates: list[TemplateSchema] = st.session_state['templates']
 
-    events = []
-    for shift in session_shifts:
-        events.append({
-            'id': shift.id,
-            'title': shift.place,
-            'start': shift.start_datetime.isoformat(),
-            'end': shift.end_datetime.isoformat(),
-        })
+    events = _get_events(calendar_month)
 
     st.subheader('シフト')
 
+    import_progress: ImportProgress | None = st.session_state.pop('import_progress', None)
+    if import_progress is not None:
+        _display_import_result(import_progress)
+
     selected_template_option = ['選択なし']
     for template in session_templates:
         selected_template_option.append(template.name)
@@ -38,8 +46,31 @@ def show_shift_page(db: DBController) -> None:
             selected_template = [template for template in session_templates if template.name == selected_template_name][0]
             _show_add_form(db, selected_template)
 
+    import_col, export_col = st.columns(2)
+    if import_col.button('インポート', use_container_width=True, key='import_shift_btn'):
+        _show_import_form(db)
+    if export_col.button('エクスポート', use_container_width=True, key='export_shift_btn'):
+        _show_export_form(db)
+
+    prev_col, today_col, next_col = st.columns(3)
+    if prev_col.button('前月', use_container_width=True, key='prev_month_btn'):
+        st.session_state['calendar_month'] = _prev_month(calendar_month)
+        st.rerun()
+    if today_col.button('今月', use_container_width=True, key='this_month_btn'):
+        del st.session_state['calendar_month']
+        st.rerun()
+    if next_col.button('翌月', use_container_width=True, key='next_month_btn'):
+        st.session_state['calendar_month'] = _next_month(calendar_month)
+        st.rerun()
+
     options = {
         'initialView': 'dayGridMonth',
+        'initialDate': calendar_month.strftime('%Y-%m-%d'),
+        'headerToolbar': {
+            'left': 'title',
+            'center': '',
+            'right': '',
+        },
         'titleFormat': {
             'year': 'numeric',
             'month': '2-digit',
@@ -49,13 +80,46 @@ def show_shift_page(db: DBController) -> None:
         'height': 'auto',
     }
 
-    calender_event = st_calendar.calendar(events=events, options=options)
+    calender_event = st_calendar.calendar(events=events, options=options, key=f'calendar_{calendar_month.strftime("%Y%m")}')
 
     if calender_event:
+        # コールバックに含まれる表示範囲のシフトが未取得なら取得
+        view = calender_event.get(calender_event['callback'], {}).get('view')
+        if view is not None and ensure_shifts_loaded(
+            db,
+            datetime.fromisoformat(view['activeStart']).replace(tzinfo=None) - timedelta(days=1),
+            datetime.fromisoformat(view['activeEnd']).replace(tzinfo=None) + timedelta(days=1),
+        ):
+            st.rerun()
+
         if calender_event['callback'] == 'eventClick':
             selected_shift_id = int(calender_event['eventClick']['event']['id'])
-            selected_shift = [shift for shift in st.session_state['shifts'] if shift.id == selected_shift_id][0]
-            _show_detail(selected_shift, db)
+            selected_shift = find_shift(selected_shift_id)
+            if selected_shift is not None:
+                _show_detail(selected_shift, db)
+
+
+def _get_visible_range(calendar_month: datetime) -> tuple[datetime, datetime]:
+    """月表示で表示される期間(前後 CALENDAR_MARGIN_DAYS 日を含む)"""
+    return (
+        calendar_month - timedelta(days=CALENDAR_MARGIN_DAYS),
+        _next_month(calendar_month) + timedelta(days=CALENDAR_MARGIN_DAYS),
+    )
+
+
+def _get_events(calendar_month: datetime) -> list[dict]:
+    """表示される期間のシフトのイベントを取得
+
+    シフトが変更されるか表示する月が変わるまでは、前回のイベントを再利用する。
+    """
+    cache_key = (get_version('shifts'), calendar_month)
+    cached = st.session_state.get('calendar_events')
+    if cached is not None and cached[0] == cache_key:
+        return cached[1]
+
+    events = get_shift_table().events(*_get_visible_range(calendar_month))
+    st.session_state['calendar_events'] = (cache_key, events)
+    return events
 
 
 @st.dialog('シフト追加')
@@ -85,71 +149,193 @@ def _show_add_form(db: DBController, template: TemplateSchema | None = None) ->
             default_value['end_time'] = template.end_time
             default_value['break_time'] = template.break_time
 
-        with st.form('add_form', border=False):
-            selected_place = st.selectbox('勤務先名を選択してください', options=[place.name for place in session_places], index=default_value['selected_place'], key='selected_place')
-            start_date = st.date_input('開始日付を入力してください', value=default_value['start_date'], key='start_date')
-            start_time = st.time_input('開始時刻を入力してください', value=default_value['start_time'], key='start_time', step=300)
-            end_date = st.date_input('終了日付を入力してください', value=default_value['end_date'], key='end_date')
-            end_time = st.time_input('終了時刻を入力してください', value=default_value['end_time'], key='end_time', step=300)
+        selected_place = st.selectbox('勤務先名を選択してください', options=[place.name for place in session_places], index=default_value['selected_place'], key='selected_place')
+        start_date = st.date_input('開始日付を入力してください', value=default_value['start_date'], key='start_date')
+        start_time = st.time_input('開始時刻を入力してください', value=default_value['start_time'], key='start_time', step=300)
+        end_date = st.date_input('終了日付を入力してください', value=default_value['end_date'], key='end_date')
+        end_time = st.time_input('終了時刻を入力してください', value=default_value['end_time'], key='end_time', step=300)
+
+        if is_repeat:
+            repeat_end_date = st.date_input('最終日付(週次)を入力してください', value=datetime.today(), key='repeat_end_date')
+
+        break_time = st.time_input('休憩時間を入力してください', value=default_value['break_time'], key='break_time', step=300)
+
+        start_datetime = datetime.combine(start_date, start_time)
+        end_datetime = datetime.combine(end_date, end_time)
+        place_id = [place.id for place in session_places if place.name == selected_place][0]
+
+        if start_datetime >= end_datetime:
+            error = '開始日時は終了日時よりも早く設定してください'
+        elif end_datetime - start_datetime <= (timedelta(hours=break_time.hour, minutes=break_time.minute)):
+            error = '休憩時間は勤務時間より短く設定してください'
+        elif is_repeat and start_date > repeat_end_date:
+            error = '開始日時は最終日付(週次)よりも早く設定してください'
+        else:
+            error = None
+
+        if error is None:
+            # 追加前に、重なる既存のシフトをセッションの索引で確認して表示
+            periods = _get_periods(start_datetime, end_datetime, repeat_end_date if is_repeat else None)
+            ensure_shifts_loaded(db, periods[0][0], periods[-1][1])
+            intervals = get_shift_intervals()
+            conflicts = [intervals.overlaps(place_id, period_start, period_end) for period_start, period_end in periods]
 
             if is_repeat:
-                repeat_end_date = st.date_input('最終日付(週次)を入力してください', value=datetime.today(), key='repeat_end_date')
+                unchanged_dates = [
+                    period_start for (period_start, period_end), conflict_shifts in zip(periods, conflicts)
+                    if _is_same_shift(conflict_shifts, period_start, period_end, break_time)
+                ]
+                replaced_dates = [
+                    period_start for (period_start, period_end), conflict_shifts in zip(periods, conflicts)
+                    if conflict_shifts and period_start not in unchanged_dates
+                ]
+                if replaced_dates:
+                    st.warning('次の日付のシフトは上書きされます：' + '、'.join(date.strftime('%Y/%m/%d') for date in replaced_dates))
+                if unchanged_dates:
+                    st.info('次の日付は同じシフトが登録済みのため追加しません：' + '、'.join(date.strftime('%Y/%m/%d') for date in unchanged_dates))
+            elif conflicts[0]:
+                st.warning('その時間はシフトが既に存在します')
+
+        if st.button('追加', type='primary', key='add_submit_btn'):
+            if error is not None:
+                st.error(error)
+            elif is_repeat:
+                insert_shifts = [
+                    InsertShiftSchema(
+                        user_id=st.session_state['user_id'],
+                        place_id=place_id,
+                        start_datetime=period_start.isoformat(timespec='seconds'),
+                        end_datetime=period_end.isoformat(timespec='seconds'),
+                        break_time=break_time.isoformat(timespec='seconds'),
+                        is_update=True,
+                    )
+                    for period_start, period_end in periods
+                    if period_start not in unchanged_dates
+                ]
 
-            break_time = st.time_input('休憩時間を入力してください', value=default_value['break_time'], key='break_time', step=300)
+                if insert_shifts:
+                    results = db.add_shifts(insert_shifts)
 
-            if st.form_submit_button('追加', type='primary'):
-                start_datetime = datetime.combine(start_date, start_time)
-                end_datetime = datetime.combine(end_date, end_time)
+                    remove_items('shifts', [id for result in results for id in result.replaced_ids])
+                    insert_items('shifts', [result.shift for result in results if result.shift is not None])
+                st.rerun()
+            elif conflicts[0]:
+                st.error('その時間はシフトが既に存在します')
+            else:
+                insert_shift = InsertShiftSchema(
+                    user_id=st.session_state['user_id'],
+                    place_id=place_id,
+                    start_datetime=start_datetime.isoformat(timespec='seconds'),
+                    end_datetime=end_datetime.isoformat(timespec='seconds'),
+                    break_time=break_time.isoformat(timespec='seconds'),
+                )
 
-                if start_datetime >= end_datetime:
-                    st.error('開始日時は終了日時よりも早く設定してください')
-                elif end_datetime - start_datetime <= (timedelta(hours=break_time.hour, minutes=break_time.minute)):
-                    st.error('休憩時間は勤務時間より短く設定してください')
-                elif is_repeat and start_date > repeat_end_date:
-                    st.error('開始日時は最終日付(週次)よりも早く設定してください')
+                added_shift = db.add_shift(insert_shift)
+                if added_shift is not None:
+                    insert_items('shifts', [added_shift])
+                    st.rerun()
                 else:
-                    place_id = [place.id for place in session_places if place.name == selected_place][0]
-
-                    if is_repeat:
-                        while start_date <= repeat_end_date:
-                            insert_shift = InsertShiftSchema(
-                                user_id=st.session_state['user_id'],
-                                place_id=place_id,
-                                start_datetime=start_datetime.isoformat(timespec='seconds'),
-                                end_datetime=end_datetime.isoformat(timespec='seconds'),
-                                break_time=break_time.isoformat(timespec='seconds'),
-                                is_update=True,
-                            )
-
-                            db.add_shift(insert_shift)
-
-                            start_date += timedelta(days=7)
-                            end_date += timedelta(days=7)
-                            start_datetime = datetime.combine(start_date, start_time)
-                            end_datetime = datetime.combine(end_date, end_time)
-
-                        st.session_state['shifts'] = db.get_shifts(st.session_state['user_id'])
-                        st.rerun()
-                    else:
-                        insert_shift = InsertShiftSchema(
-                            user_id=st.session_state['user_id'],
-                            place_id=place_id,
-                            start_datetime=start_datetime.isoformat(timespec='seconds'),
-                            end_datetime=end_datetime.isoformat(timespec='seconds'),
-                            break_time=break_time.isoformat(timespec='seconds'),
-                        )
-
-                        if db.add_shift(insert_shift):
-                            st.session_state['shifts'] = db.get_shifts(st.session_state['user_id'])
-                            st.rerun()
-                        else:
-                            st.error('その時間はシフトが既に存在します')
+                    st.error('その時間はシフトが既に存在します')
     else:
         st.error('勤務先が登録されていません')
 
 
+@st.dialog('シフトのインポート')
+def _show_import_form(db: DBController) -> None:
+    """シフトのインポートダイアログを表示"""
+    if not st.session_state['places']:
+        st.error('勤務先が登録されていません')
+        return
+
+    st.caption('CSV は「勤務先名,開始日時,終了日時,休憩時間」の列、iCalendar は予定の件名を勤務先名として取り込みます')
+    uploaded_file = st.file_uploader('ファイルを選択してください', type=['csv', 'ics'], key='import_file')
+    is_update = st.checkbox('重なるシフトを上書きする', key='import_is_update')
+
+    if st.button('インポート', type='primary', key='import_submit_btn'):
+        if uploaded_file is None:
+            st.error('ファイルが選択されていません')
+            return
+
+        progress_bar = st.progress(0.0, text='インポート中')
+        for progress, results in import_shifts(
+            db,
+            uploaded_file,
+            uploaded_file.name,
+            st.session_state['user_id'],
+            st.session_state['places'],
+            is_update,
+        ):
+            remove_items('shifts', [id for result in results for id in result.replaced_ids])
+            insert_items('shifts', [result.shift for result in results if result.shift is not None])
+            progress_bar.progress(
+                min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0),
+                text=f'インポート中({progress.rows:,}行)',
+            )
+
+        st.session_state['import_progress'] = progress
+        st.rerun()
+
+
+@st.dialog('シフトのエクスポート')
+def _show_export_form(db: DBController) -> None:
+    """シフトのエクスポートダイアログを表示"""
+    export_format = st.selectbox(
+        '形式を選択してください',
+        options=list(EXPORT_FORMATS),
+        format_func=lambda key: EXPORT_FORMATS[key][0],
+        key='export_format',
+    )
+
+    if st.button('ファイルを作成', type='primary', key='export_submit_btn'):
+        with st.spinner('ファイルを作成中'):
+            file = export_shifts(db, st.session_state['user_id'], export_format)
+
+        _, file_name, mime = EXPORT_FORMATS[export_format]
+        with file:
+            st.download_button('ダウンロード', data=file, file_name=file_name, mime=mime, on_click='ignore', key='export_download_btn')
+
+
+def _display_import_result(progress: ImportProgress) -> None:
+    """インポートの結果を表示"""
+    message = f'{progress.rows:,}行のうち{progress.added:,}件のシフトを追加しました'
+    if progress.replaced:
+        message += f'(上書き{progress.replaced:,}件)'
+    st.success(message)
+
+    if progress.skipped:
+        st.warning(f'{progress.skipped:,}件は既存のシフトと重なるため追加しませんでした')
+    if progress.error_count:
+        st.error(f'{progress.error_count:,}行は取り込めませんでした')
+        st.dataframe(
+            [{'行': error.line, '内容': error.message} for error in progress.errors],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+def _get_periods(start_datetime: datetime, end_datetime: datetime, repeat_end_date: date | None) -> list[tuple[datetime, datetime]]:
+    """追加するシフトの勤務時間の一覧(週次登録の場合は最終日付までの毎週)"""
+    periods = [(start_datetime, end_datetime)]
+    if repeat_end_date is None:
+        return periods
+
+    while (periods[-1][0] + timedelta(days=7)).date() <= repeat_end_date:
+        periods.append((periods[-1][0] + timedelta(days=7), periods[-1][1] + timedelta(days=7)))
+    return periods
+
+
+def _is_same_shift(shifts: list[ShiftRecord], start_datetime: datetime, end_datetime: datetime, break_time: time) -> bool:
+    """重なるシフトが、追加するシフトと同じ内容の1件のみか"""
+    return (
+        len(shifts) == 1
+        and shifts[0].start_datetime == start_datetime
+        and shifts[0].end_datetime == end_datetime
+        and shifts[0].break_time == break_time
+    )
+
+
 @st.dialog('シフト詳細')
-def _show_detail(shift: ShiftSchema, db: DBController) -> None:
+def _show_detail(shift: ShiftRecord, db: DBController) -> None:
     """シフト詳細ダイアログを表示"""
     st.write(f'勤務先：{shift.place}')
     st.write(f'開始日時：{shift.start_datetime.strftime("%Y/%m/%d %H:%M")}')
@@ -160,6 +346,18 @@ def _show_detail(shift: ShiftSchema, db: DBController) -> None:
     st.write(f'見込額：{shift.amount:,}円')
 
     if st.button('削除', type='primary', key='delete_btn'):
-        db.delete_shift(shift.id)
-        st.session_state['shifts'] = db.get_shifts(st.session_state['user_id'])
+        if db.delete_shift(shift.id):
+            remove_items('shifts', [shift.id])
+        else:
+            reload_items('shifts', db)
         st.rerun()
+
+
+def _prev_month(month: datetime) -> datetime:
+    """前月の1日を取得"""
+    return datetime(month.year - 1, 12, 1) if month.month == 1 else datetime(month.year, month.month - 1, 1)
+
+
+def _next_month(month: datetime) -> datetime:
+    """翌月の1日を取得"""
+    return datetime(month.year + 1, 1, 1) if month.month == 12 else datetime(month.year, month.month + 1, 1)
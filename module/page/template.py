@@ -5,6 +5,7 @@ import streamlit as st
 from st_aggrid import AgGrid, GridOptionsBuilder
 
 from module.db import DBController
+from module.state import insert_items, remove_items, reload_items
 from schemas.place import PlaceSchema
 from schemas.template import TemplateSchema, InsertTemplateSchema
 
@@ -82,8 +83,9 @@ def _show_add_form(db: DBController) -> None:
                         break_time=break_time.isoformat(timespec='seconds'),
                     )
 
-                    if db.add_template(insert_template):
-                        st.session_state['templates'] = db.get_templates(st.session_state['user_id'])
+                    added_template = db.add_template(insert_template)
+                    if added_template is not None:
+                        insert_items('templates', [added_template])
                         st.rerun()
                     else:
                         st.error(f'名称{name}は既に存在します')
@@ -100,6 +102,8 @@ def _show_detail(template: TemplateSchema, db: DBController) -> None:
     st.write(f'休憩時間：{template.break_time.strftime("%H:%M")}')
 
     if st.button('削除', type='primary', key='delete_btn'):
-        db.delete_template(template.id)
-        st.session_state['templates'] = db.get_templates(st.session_state['user_id'])
+        if db.delete_template(template.id):
+            remove_items('templates', [template.id])
+        else:
+            reload_items('templates', db)
         st.rerun()
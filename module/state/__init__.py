@@ -0,0 +1,5 @@
+from .session_store import set_items, insert_items, remove_items, reload_items, get_derived, get_incremental, get_version
+from .shift_window import ensure_shifts_loaded
+from .shift_store import get_shift_table, get_shift_index, get_payroll_history, get_shift_intervals, find_shift
+from .hydration import load_user_data
+from .write_behind import apply_write_behind_events
\ No newline at end of file
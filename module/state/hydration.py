@@ -0,0 +1,16 @@
+import asyncio
+from datetime import datetime
+
+from module.db import DBController, AsyncDBController
+from module.state.session_store import set_items
+from module.state.shift_window import get_initial_window_start, set_loaded_shifts
+
+
+def load_user_data(db: DBController, user_id: int, today: datetime) -> None:
+    """ログイン時に勤務先・シフト・テンプレートを並行して読み込む"""
+    window_start = get_initial_window_start(today)
+    places, shifts, templates = asyncio.run(AsyncDBController(db).get_user_data(user_id, window_start))
+
+    set_items('places', places)
+    set_loaded_shifts(shifts, window_start)
+    set_items('templates', templates)
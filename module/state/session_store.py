@@ -0,0 +1,102 @@
+from bisect import insort
+from collections.abc import Callable, Iterable
+from typing import Any
+
+import streamlit as st
+
+from module.db import DBController
+
+
+# セッションに保持するコレクションと並び順
+_SORT_KEYS: dict[str, Callable[[Any], Any]] = {
+    'shifts': lambda shift: (shift.start_datetime, shift.id),
+    'places': lambda place: place.id,
+    'templates': lambda template: template.id,
+}
+
+
+def set_items(key: str, items: Iterable[Any]) -> None:
+    """コレクションを丸ごと置き換える"""
+    st.session_state[key] = sorted(items, key=_SORT_KEYS[key])
+    _bump_version(key)
+
+
+def insert_items(key: str, items: Iterable[Any]) -> None:
+    """並び順を保ったままコレクションに追加"""
+    items = list(items)
+    session_items: list = st.session_state[key]
+    for item in items:
+        insort(session_items, item, key=_SORT_KEYS[key])
+    _update_incremental(key, 'add', items)
+    _bump_version(key)
+
+
+def remove_items(key: str, ids: Iterable[int]) -> None:
+    """指定したIDの要素をコレクションから削除"""
+    ids = set(ids)
+    if not ids:
+        return
+
+    removed_items = [item for item in st.session_state[key] if item.id in ids]
+    st.session_state[key] = [item for item in st.session_state[key] if item.id not in ids]
+    _update_incremental(key, 'remove', removed_items)
+    _bump_version(key)
+
+
+def reload_items(key: str, db: DBController) -> None:
+    """データベースから再取得してコレクションを置き換える(差分更新できない場合の代替手段)"""
+    user_id = st.session_state['user_id']
+
+    if key == 'shifts':
+        # 読み込み済みの期間のみ取得し直す
+        set_items(key, db.get_shifts(user_id, start_datetime=st.session_state.get('shifts_loaded_from')))
+        st.session_state['shifts_loaded_months'] = set()
+    elif key == 'places':
+        set_items(key, db.get_places(user_id))
+    else:
+        set_items(key, db.get_templates(user_id))
+
+
+def get_derived(key: str, name: str, factory: Callable[[list], Any]) -> Any:
+    """コレクションから作成したデータを取得
+
+    コレクションのバージョンごとに1度だけ factory で作成し、セッションに保持する。
+    """
+    version = get_version(key)
+    cached = st.session_state.get(f'{key}_{name}')
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    derived = factory(st.session_state[key])
+    st.session_state[f'{key}_{name}'] = (version, derived)
+    return derived
+
+
+def get_incremental(key: str, name: str, factory: Callable[[list], Any]) -> Any:
+    """コレクションから作成したデータを取得(追加・削除は差分で反映)
+
+    初回とコレクションを丸ごと置き換えた後は factory で作成し、
+    insert_items / remove_items では作成済みのデータの add / remove で更新する。
+    """
+    st.session_state.setdefault(f'{key}_incremental', set()).add(name)
+    return get_derived(key, name, factory)
+
+
+def get_version(key: str) -> int:
+    """コレクションのバージョンを取得(変更のたびに増加)"""
+    return st.session_state.get(f'{key}_version', 0)
+
+
+def _update_incremental(key: str, method: str, items: list) -> None:
+    """差分で更新するデータに追加・削除を反映(現在のバージョンで作成済みのもののみ)"""
+    version = get_version(key)
+    for name in st.session_state.get(f'{key}_incremental', ()):
+        cached = st.session_state.get(f'{key}_{name}')
+        if cached is not None and cached[0] == version:
+            getattr(cached[1], method)(items)
+            st.session_state[f'{key}_{name}'] = (version + 1, cached[1])
+
+
+def _bump_version(key: str) -> None:
+    """コレクションのバージョンを進める"""
+    st.session_state[f'{key}_version'] = get_version(key) + 1
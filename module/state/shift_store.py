@@ -0,0 +1,62 @@
+from typing import TYPE_CHECKING
+
+import streamlit as st
+
+from module.core import ShiftIntervals
+from module.db import DBController
+from module.state.session_store import get_derived, get_incremental
+from module.state.shift_window import ensure_shifts_loaded, is_shifts_loaded
+from schemas.shift import ShiftRecord
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from module.core.shift_index import ShiftIndex
+    from module.core.shift_table import ShiftTable
+
+
+# pandas を使う表・索引は、ログイン画面などで pandas を読み込まないよう使うときに読み込む
+def get_shift_table() -> 'ShiftTable':
+    """セッションのシフトの表を取得(シフトが変更されるまで再利用)"""
+    from module.core.shift_table import ShiftTable
+    return get_derived('shifts', 'table', ShiftTable)
+
+
+def get_shift_index() -> 'ShiftIndex':
+    """セッションのシフトの索引を取得(シフトが変更されるまで再利用)"""
+    from module.core.shift_index import ShiftIndex
+    return get_derived('shifts', 'index', lambda shifts: ShiftIndex(get_shift_table()))
+
+
+def get_payroll_history(db: DBController) -> 'pd.DataFrame':
+    """セッションのシフトの勤務先・締め期間ごとの給料の一覧を取得(シフトが変更されるまで再利用)
+
+    読み込み済みの期間の先頭を含む締め期間は、それより前の月のシフトを取得して補完する。
+    シフトを取得していない月を含む締め期間は金額が不完全なため除く。
+    """
+    from module.core.payroll_period import build_payroll_history
+    history = get_derived('shifts', 'payroll_history', lambda shifts: build_payroll_history(get_shift_table()))
+
+    loaded_from = st.session_state['shifts_loaded_from']
+    partial = history[(history['period_start'] < loaded_from) & (history['period_end'] >= loaded_from)]
+    if not partial.empty and ensure_shifts_loaded(db, partial['period_start'].min().to_pydatetime(), loaded_from):
+        history = get_derived('shifts', 'payroll_history', lambda shifts: build_payroll_history(get_shift_table()))
+
+    is_complete = [
+        is_shifts_loaded(period_start, period_end)
+        for period_start, period_end in zip(history['period_start'].tolist(), history['period_end'].tolist())
+    ]
+    return history.loc[is_complete]
+
+
+def get_shift_intervals() -> ShiftIntervals:
+    """セッションのシフトの重複確認用の索引を取得(追加・削除は差分で反映)"""
+    return get_incremental('shifts', 'intervals', ShiftIntervals)
+
+
+def find_shift(id: int) -> ShiftRecord | None:
+    """IDのシフトをセッションから取得"""
+    position = get_shift_table().position(id)
+    if position is None:
+        return None
+    return st.session_state['shifts'][position]
@@ -0,0 +1,88 @@
+from collections.abc import Iterator
+from datetime import datetime
+
+import streamlit as st
+
+from module.db import DBController
+from module.state.session_store import set_items, insert_items, remove_items
+from schemas.shift import ShiftRecord
+
+
+def get_initial_window_start(today: datetime) -> datetime:
+    """ログイン時に読み込むシフトの開始日時(今年の1月1日と前月1日の早い方)"""
+    return min(datetime(today.year, 1, 1), _add_months(_month_start(today), -1))
+
+
+def set_loaded_shifts(shifts: list[ShiftRecord], window_start: datetime) -> None:
+    """window_start 以降のシフトをセッションに設定
+
+    それより前の月はカレンダーで表示されたときに ensure_shifts_loaded で取得する。
+    """
+    set_items('shifts', shifts)
+    st.session_state['shifts_loaded_from'] = window_start
+    st.session_state['shifts_loaded_months'] = set()
+
+
+def is_shifts_loaded(start_datetime: datetime, end_datetime: datetime) -> bool:
+    """[start_datetime, end_datetime) を含む月のシフトが全て取得済みか"""
+    loaded_from: datetime = st.session_state['shifts_loaded_from']
+    loaded_months: set[datetime] = st.session_state['shifts_loaded_months']
+    return all(month >= loaded_from or month in loaded_months for month in _iter_months(start_datetime, end_datetime))
+
+
+def ensure_shifts_loaded(db: DBController, start_datetime: datetime, end_datetime: datetime) -> bool:
+    """[start_datetime, end_datetime) を含む月のうち、未取得の月のシフトを取得
+
+    新たに取得した月があれば True を返す。
+    """
+    loaded_from: datetime = st.session_state['shifts_loaded_from']
+    loaded_months: set[datetime] = st.session_state['shifts_loaded_months']
+
+    missing_months = [
+        month for month in _iter_months(start_datetime, end_datetime)
+        if month < loaded_from and month not in loaded_months
+    ]
+
+    for range_start, range_end in _group_consecutive_months(missing_months):
+        shifts = db.get_shifts(st.session_state['user_id'], start_datetime=range_start, end_datetime=range_end)
+        # 未取得の月に追加済みのシフトは取得結果で置き換える
+        remove_items('shifts', [shift.id for shift in shifts])
+        insert_items('shifts', shifts)
+
+    loaded_months.update(missing_months)
+    return bool(missing_months)
+
+
+def _iter_months(start_datetime: datetime, end_datetime: datetime) -> Iterator[datetime]:
+    """[start_datetime, end_datetime) を含む各月の1日を返す"""
+    month = _month_start(start_datetime)
+    while month < end_datetime:
+        yield month
+        month = _add_months(month, 1)
+
+
+def _group_consecutive_months(months: list[datetime]) -> Iterator[tuple[datetime, datetime]]:
+    """連続する月をまとめ、[開始月の1日, 終了月の翌月1日) の組を返す"""
+    range_start = range_end = None
+    for month in sorted(months):
+        if range_end is not None and month == range_end:
+            range_end = _add_months(month, 1)
+            continue
+
+        if range_start is not None:
+            yield range_start, range_end
+        range_start, range_end = month, _add_months(month, 1)
+
+    if range_start is not None:
+        yield range_start, range_end
+
+
+def _month_start(value: datetime) -> datetime:
+    """月の1日0時を取得"""
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    """月の1日に指定した月数を加算"""
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return datetime(year, month_index + 1, 1)
@@ -0,0 +1,33 @@
+import streamlit as st
+
+from module.db import DBController
+from module.db.write_behind import WriteBehindDBController
+from module.state.session_store import insert_items, remove_items, reload_items
+
+
+def apply_write_behind_events(db: DBController) -> list[str]:
+    """非同期の書き込みの反映結果をセッションに適用し、反映できなかった理由を返す"""
+    if not isinstance(db, WriteBehindDBController):
+        return []
+
+    messages = []
+    for event in db.pop_events():
+        if event.key not in st.session_state:
+            continue
+
+        if event.kind == 'resolved':
+            # 反映中に削除された追加は、削除の反映を待つためセッションに戻さない
+            if any(item.id == event.provisional_id for item in st.session_state[event.key]):
+                remove_items(event.key, [event.provisional_id])
+                insert_items(event.key, [event.row])
+        elif event.kind == 'removed':
+            remove_items(event.key, event.ids)
+        elif event.kind == 'rejected':
+            if event.provisional_id is None:
+                # 削除できなかったレコードはデータベースから取得し直す
+                reload_items(event.key, db)
+            else:
+                remove_items(event.key, [event.provisional_id])
+            messages.append(event.message)
+
+    return messages
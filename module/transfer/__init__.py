@@ -0,0 +1,2 @@
+from .shift_import import IMPORT_CHUNK_SIZE, ImportProgress, ImportRowError, import_shifts, read_csv, read_ics, to_insert_shifts, chunked
+from .shift_export import EXPORT_FORMATS, export_shifts, to_csv, to_ics, to_payroll_csv, write_chunks
\ No newline at end of file
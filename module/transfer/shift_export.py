@@ -0,0 +1,169 @@
+import csv
+import io
+import tempfile
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from typing import BinaryIO
+
+import numpy as np
+
+from module.core.payroll_period import assign_periods
+from module.db import DBController
+from module.db.db_controller import PAGE_SIZE
+from module.transfer.shift_import import ICS_BREAK_TIME, chunked
+from schemas.shift import ShiftRecord
+
+
+EXPORT_FORMATS = {
+    'csv': ('シフト一覧(CSV)', 'shifts.csv', 'text/csv'),
+    'ics': ('シフト一覧(iCalendar)', 'shifts.ics', 'text/calendar'),
+    'payroll': ('締め期間ごとの給料(CSV)', 'payroll.csv', 'text/csv'),
+}
+ICS_LINE_OCTETS = 75  # iCalendar の1行のバイト数の上限(超える場合は折り返す)
+
+
+def export_shifts(db: DBController, user_id: int, export_format: str, page_size: int = PAGE_SIZE) -> BinaryIO:
+    """シフトを export_format (EXPORT_FORMATS のキー) で出力した一時ファイルを返す
+
+    シフトは1ページずつ取得して書き出し、保持するのは1ページ分のみとする。
+    """
+    pages = chunked(db.iter_shifts(user_id, page_size=page_size, prefetch=True), page_size)
+    if export_format == 'ics':
+        chunks = to_ics(pages)
+    elif export_format == 'payroll':
+        chunks = to_payroll_csv(pages)
+    else:
+        chunks = to_csv(pages)
+    return write_chunks(chunks)
+
+
+def to_csv(pages: Iterable[list[ShiftRecord]]) -> Iterator[bytes]:
+    """シフトの一覧を CSV にする(先頭4列はインポートと同じ形式)"""
+    yield _csv_chunk([['勤務先名', '開始日時', '終了日時', '休憩時間', '時給', '深夜給', '見込額']], bom=True)
+    for page in pages:
+        yield _csv_chunk([
+            [
+                shift.place,
+                shift.start_datetime.isoformat(timespec='minutes'),
+                shift.end_datetime.isoformat(timespec='minutes'),
+                shift.break_time.isoformat(timespec='minutes'),
+                shift.wage,
+                '有' if shift.has_night_wage else '無',
+                shift.amount,
+            ]
+            for shift in page
+        ])
+
+
+def to_ics(pages: Iterable[list[ShiftRecord]]) -> Iterator[bytes]:
+    """シフトの一覧を iCalendar にする(件名は勤務先名、インポートで読み込める形式)"""
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    yield _ics_chunk(['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//shift-app//shift-app//JA', 'CALSCALE:GREGORIAN'])
+    for page in pages:
+        lines = []
+        for shift in page:
+            lines.extend([
+                'BEGIN:VEVENT',
+                f'UID:shift-{shift.id}@shift-app',
+                f'DTSTAMP:{stamp}',
+                f'DTSTART:{shift.start_datetime.strftime("%Y%m%dT%H%M%S")}',
+                f'DTEND:{shift.end_datetime.strftime("%Y%m%dT%H%M%S")}',
+                f'SUMMARY:{_escape_ics_text(shift.place)}',
+                f'DESCRIPTION:{_escape_ics_text(f"見込額 {shift.amount:,}円")}',
+                f'{ICS_BREAK_TIME}:{shift.break_time.isoformat(timespec="seconds")}',
+                'END:VEVENT',
+            ])
+        yield _ics_chunk(lines)
+    yield _ics_chunk(['END:VCALENDAR'])
+
+
+def to_payroll_csv(pages: Iterable[list[ShiftRecord]]) -> Iterator[bytes]:
+    """勤務先・締め期間ごとの給料を CSV にする
+
+    ページごとに締め期間を割り当てて集計し、保持するのは勤務先と締め期間ごとの合計のみとする。
+    """
+    totals: dict[tuple, list[int]] = {}
+    places: dict[int, str] = {}
+    for page in pages:
+        for place_id, shifts in _group_by_place(page).items():
+            place = shifts[0].place_info
+            places[place_id] = place.name
+            period_starts, period_ends, pay_dates = assign_periods(
+                np.array([shift.end_datetime for shift in shifts], dtype='datetime64[s]'),
+                place.closing_day,
+                place.pay_day,
+            )
+            for shift, period_start, period_end, pay_date in zip(shifts, period_starts.tolist(), period_ends.tolist(), pay_dates.tolist()):
+                total = totals.setdefault((period_end, places[place_id], place_id, period_start, pay_date), [0, 0])
+                total[0] += shift.amount
+                total[1] += 1
+
+    yield _csv_chunk([['締め期間開始日', '締め期間終了日', '勤務先名', '給料日', '金額', '勤務数']], bom=True)
+    yield _csv_chunk([
+        [
+            period_start.strftime('%Y-%m-%d'),
+            period_end.strftime('%Y-%m-%d'),
+            place,
+            pay_date.isoformat(),
+            amount,
+            shift_count,
+        ]
+        for (period_end, place, _, period_start, pay_date), (amount, shift_count) in sorted(totals.items())
+    ])
+
+
+def write_chunks(chunks: Iterable[bytes]) -> BinaryIO:
+    """バイト列を一時ファイルに書き出し、先頭から読み込める状態で返す"""
+    file = tempfile.TemporaryFile()
+    for chunk in chunks:
+        file.write(chunk)
+    file.flush()
+    # st.download_button が受け付ける BufferedReader として開き直す
+    reader = open(file.fileno(), 'rb', closefd=False)
+    reader.seek(0)
+    reader.tempfile = file  # 一時ファイルは reader と同時に破棄する
+    return reader
+
+
+def _group_by_place(shifts: list[ShiftRecord]) -> dict[int, list[ShiftRecord]]:
+    """シフトを勤務先ごとに分ける"""
+    groups: dict[int, list[ShiftRecord]] = {}
+    for shift in shifts:
+        groups.setdefault(shift.place_id, []).append(shift)
+    return groups
+
+
+def _csv_chunk(rows: list[list], bom: bool = False) -> bytes:
+    """行の一覧を CSV のバイト列にする"""
+    text = io.StringIO()
+    csv.writer(text, lineterminator='\r\n').writerows(rows)
+    return text.getvalue().encode('utf-8-sig' if bom else 'utf-8')
+
+
+def _ics_chunk(lines: list[str]) -> bytes:
+    """行の一覧を折り返した iCalendar のバイト列にする"""
+    return ''.join(_fold_ics_line(line) for line in lines).encode('utf-8')
+
+
+def _fold_ics_line(line: str) -> str:
+    """ICS_LINE_OCTETS バイトを超える行を折り返す(文字の途中では折り返さない)"""
+    if len(line.encode('utf-8')) <= ICS_LINE_OCTETS:
+        return line + '\r\n'
+
+    parts = []
+    part, octets = '', 0
+    for character in line:
+        character_octets = len(character.encode('utf-8'))
+        # 2行目以降は先頭の空白1バイトを含める
+        if octets + character_octets > ICS_LINE_OCTETS - (1 if parts else 0):
+            parts.append(part)
+            part, octets = '', 0
+        part += character
+        octets += character_octets
+    parts.append(part)
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _escape_ics_text(value: str) -> str:
+    """iCalendar のテキストをエスケープ"""
+    return value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
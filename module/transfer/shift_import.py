@@ -0,0 +1,300 @@
+import csv
+import io
+import logging
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta, timezone
+from itertools import islice
+from typing import BinaryIO, TypeVar
+
+from pydantic import ValidationError
+
+from module.db import DBController
+from schemas.place import PlaceSchema
+from schemas.shift import InsertShiftSchema, AddShiftResultSchema
+
+
+IMPORT_CHUNK_SIZE = 500  # 1回の一括追加で送るシフトの件数
+MAX_REPORTED_ERRORS = 100  # 保持するエラーの件数の上限(件数は全て数える)
+
+# CSV の列名(日本語・英語のどちらでもよい)
+CSV_COLUMNS = {
+    'place': ('勤務先名', 'place'),
+    'start_datetime': ('開始日時', 'start_datetime'),
+    'end_datetime': ('終了日時', 'end_datetime'),
+    'break_time': ('休憩時間', 'break_time'),
+}
+ICS_BREAK_TIME = 'X-SHIFT-BREAK-TIME'  # iCalendar で休憩時間を表す独自プロパティ
+
+_DATETIME_FORMATS = ('%Y/%m/%d %H:%M', '%Y/%m/%d %H:%M:%S')
+
+T = TypeVar('T')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportRowError():
+    """取り込めなかった行"""
+    line: int  # ファイルの行番号(iCalendar は BEGIN:VEVENT の行)
+    message: str
+
+
+@dataclass
+class ImportProgress():
+    """取り込みの進捗(累計)"""
+    rows: int = 0  # 読み込んだ行数
+    added: int = 0  # 追加したシフトの件数
+    replaced: int = 0  # 上書きで無効化したシフトの件数
+    skipped: int = 0  # 既存のシフトと重なるため追加しなかった件数
+    failed: int = 0  # データベースに追加できなかった件数(error_count にも含む)
+    error_count: int = 0  # 取り込めなかった行数
+    errors: list[ImportRowError] = field(default_factory=list)  # 先頭 MAX_REPORTED_ERRORS 件
+
+
+def import_shifts(
+    db: DBController,
+    file: BinaryIO,
+    filename: str,
+    user_id: int,
+    places: list[PlaceSchema],
+    is_update: bool = False,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Iterator[tuple[ImportProgress, list[AddShiftResultSchema]]]:
+    """CSV または iCalendar のファイルからシフトを取り込む
+
+    ファイルを1行ずつ読み、勤務先名の変換と検証を行ったシフトを chunk_size 件ずつ
+    add_shifts で追加する。重なりの判定は add_shifts に任せ、is_update なら上書き、
+    そうでなければ追加しない。一括追加ごとに進捗と add_shifts の結果を返す。
+    一括追加に失敗した場合は、その行をエラーとして記録して次の一括追加に進む。
+    読み込み中のファイルの内容は1回の一括追加分のみ保持する。
+    """
+    progress = ImportProgress()
+    rows = read_ics(file) if filename.lower().endswith('.ics') else read_csv(file)
+    shifts = _collect_errors(to_insert_shifts(_count_rows(rows, progress), user_id, places, is_update), progress)
+
+    for chunk in chunked(shifts, chunk_size):
+        try:
+            results = db.add_shifts([shift for _, shift in chunk])
+        except Exception:
+            logger.exception('failed to import %d shifts', len(chunk))
+            progress.failed += len(chunk)
+            for line, _ in chunk:
+                _add_error(progress, ImportRowError(line, 'データベースに追加できませんでした'))
+            yield progress, []
+            continue
+
+        for result in results:
+            if result.shift is None:
+                progress.skipped += 1
+            else:
+                progress.added += 1
+                progress.replaced += len(result.replaced_ids)
+        yield progress, results
+
+    if progress.added + progress.skipped + progress.failed == 0:
+        yield progress, []  # 追加するシフトがない場合も最終的な進捗を返す
+
+
+def read_csv(file: BinaryIO) -> Iterator[tuple[int, dict[str, str]]]:
+    """CSV を1行ずつ読み、(行番号, {列: 値}) を返す(列は CSV_COLUMNS のキー)"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        reader = csv.reader(text)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        indexes = {}
+        for key, names in CSV_COLUMNS.items():
+            for index, name in enumerate(header):
+                if name.strip() in names:
+                    indexes[key] = index
+
+        for values in reader:
+            if not any(value.strip() for value in values):
+                continue
+            yield reader.line_num, {
+                key: values[index].strip()
+                for key, index in indexes.items()
+                if index < len(values)
+            }
+    finally:
+        text.detach()  # アップロードされたファイルは閉じない
+
+
+def read_ics(file: BinaryIO) -> Iterator[tuple[int, dict[str, str]]]:
+    """iCalendar の VEVENT を1件ずつ読み、(行番号, {列: 値}) を返す(列は CSV_COLUMNS のキー)"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        event: dict[str, str] | None = None
+        event_line = 0
+        for line_number, line in _unfold_lines(text):
+            name, _, value = line.partition(':')
+            name, *parameters = name.split(';')
+            name = name.upper()
+
+            if name == 'BEGIN' and value.upper() == 'VEVENT':
+                event, event_line = {}, line_number
+            elif event is None:
+                continue
+            elif name == 'END' and value.upper() == 'VEVENT':
+                yield event_line, event
+                event = None
+            elif name == 'SUMMARY':
+                event['place'] = _unescape_ics_text(value)
+            elif name in ('DTSTART', 'DTEND'):
+                key = 'start_datetime' if name == 'DTSTART' else 'end_datetime'
+                event[key] = _parse_ics_datetime(value, parameters)
+            elif name == ICS_BREAK_TIME:
+                event['break_time'] = value.strip()
+    finally:
+        text.detach()  # アップロードされたファイルは閉じない
+
+
+def to_insert_shifts(
+    rows: Iterable[tuple[int, dict[str, str]]],
+    user_id: int,
+    places: list[PlaceSchema],
+    is_update: bool = False,
+) -> Iterator[tuple[int, InsertShiftSchema] | ImportRowError]:
+    """読み込んだ行を検証し、(行番号, 追加するシフト) またはエラーを返す"""
+    place_ids = {place.name: place.id for place in places}
+
+    for line, row in rows:
+        place_id = place_ids.get(row.get('place', ''))
+        if place_id is None:
+            yield ImportRowError(line, f'勤務先「{row.get("place", "")}」が登録されていません')
+            continue
+
+        try:
+            start_datetime = _parse_datetime(row.get('start_datetime', ''))
+        except ValueError:
+            yield ImportRowError(line, '開始日時の形式が正しくありません')
+            continue
+        try:
+            end_datetime = _parse_datetime(row.get('end_datetime', ''))
+        except ValueError:
+            yield ImportRowError(line, '終了日時の形式が正しくありません')
+            continue
+        try:
+            break_time = time.fromisoformat(row.get('break_time') or '00:00:00')
+        except ValueError:
+            yield ImportRowError(line, '休憩時間の形式が正しくありません')
+            continue
+
+        if start_datetime >= end_datetime:
+            yield ImportRowError(line, '開始日時は終了日時よりも早く設定してください')
+            continue
+        if end_datetime - start_datetime <= timedelta(hours=break_time.hour, minutes=break_time.minute):
+            yield ImportRowError(line, '休憩時間は勤務時間より短く設定してください')
+            continue
+
+        try:
+            yield line, InsertShiftSchema(
+                user_id=user_id,
+                place_id=place_id,
+                start_datetime=start_datetime.isoformat(timespec='seconds'),
+                end_datetime=end_datetime.isoformat(timespec='seconds'),
+                break_time=break_time.isoformat(timespec='seconds'),
+                is_update=is_update,
+            )
+        except ValidationError as e:
+            yield ImportRowError(line, str(e))
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    """size 件ずつのリストに分ける"""
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _count_rows(rows: Iterable[tuple[int, dict[str, str]]], progress: ImportProgress) -> Iterator[tuple[int, dict[str, str]]]:
+    """読み込んだ行数を数える"""
+    for row in rows:
+        progress.rows += 1
+        yield row
+
+
+def _collect_errors(
+    items: Iterable[tuple[int, InsertShiftSchema] | ImportRowError],
+    progress: ImportProgress,
+) -> Iterator[tuple[int, InsertShiftSchema]]:
+    """エラーを進捗に記録し、追加するシフトのみ返す"""
+    for item in items:
+        if isinstance(item, ImportRowError):
+            _add_error(progress, item)
+        else:
+            yield item
+
+
+def _add_error(progress: ImportProgress, error: ImportRowError) -> None:
+    """エラーを進捗に記録(保持するのは先頭 MAX_REPORTED_ERRORS 件)"""
+    progress.error_count += 1
+    if len(progress.errors) < MAX_REPORTED_ERRORS:
+        progress.errors.append(error)
+
+
+def _parse_datetime(value: str) -> datetime:
+    """日時の文字列を変換(ISO 8601 または YYYY/MM/DD HH:MM)"""
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except ValueError:
+        pass
+
+    for datetime_format in _DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, datetime_format)
+        except ValueError:
+            pass
+    raise ValueError(value)
+
+
+def _unfold_lines(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """折り返された行をつなげ、(開始行の行番号, 行) を返す"""
+    pending, pending_number = None, 0
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+
+        if pending:
+            yield pending_number, pending
+        pending, pending_number = line, line_number
+
+    if pending:
+        yield pending_number, pending
+
+
+def _parse_ics_datetime(value: str, parameters: list[str]) -> str:
+    """DTSTART / DTEND の値を ISO 8601 の文字列に変換(UTC はローカル時刻にする)
+
+    終日の予定(日付のみ)は変換できないため空文字を返す。
+    """
+    value = value.strip()
+    if 'VALUE=DATE' in (parameter.upper() for parameter in parameters) or 'T' not in value:
+        return ''
+
+    try:
+        if value.endswith('Z'):
+            return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None).isoformat()
+        return datetime.strptime(value, '%Y%m%dT%H%M%S').isoformat()
+    except ValueError:
+        return ''
+
+
+def _unescape_ics_text(value: str) -> str:
+    """iCalendar のテキストのエスケープを戻す"""
+    result = []
+    characters = iter(value)
+    for character in characters:
+        if character == '\\':
+            escaped = next(characters, '')
+            result.append('\n' if escaped in ('n', 'N') else escaped)
+        else:
+            result.append(character)
+    return ''.join(result).strip()
+
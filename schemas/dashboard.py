@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from pydantic import BaseModel, Field
+
+
+class PlaceDashboardSchema(BaseModel):
+    place_id: int = Field(..., ge=1)
+    place: str = Field(..., min_length=1)
+    amount: int
+    next_shift: datetime | None
+    to_closing_day: int
+    to_pay_day: int
+
+
+class HomeDashboardSchema(BaseModel):
+    start_datetime: datetime
+    end_datetime: datetime
+    current_amount: int
+    year_amount: int
+    next_shift: datetime | None
+    places: list[PlaceDashboardSchema]
@@ -1,21 +1,9 @@
+import threading
 from datetime import datetime, time
+from typing import Annotated, ClassVar
 
-from pydantic import BaseModel, Field
-
-
-class ShiftSchema(BaseModel):
-    id: int = Field(..., ge=1)
-    user_id: int = Field(..., ge=1)
-    place_id: int = Field(..., ge=1)
-    start_datetime: datetime
-    end_datetime: datetime
-    break_time: time
-    place: str = Field(..., min_length=1)
-    wage: int = Field(..., ge=0)
-    has_night_wage: bool
-    closing_day: int = Field(..., ge=1, le=31)
-    pay_day: int = Field(..., ge=1, le=31)
-    amount: int = Field(..., ge=0)
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing_extensions import TypedDict
 
 
 class InsertShiftSchema(BaseModel):
@@ -25,3 +13,111 @@ class InsertShiftSchema(BaseModel):
     end_datetime: str
     break_time: str
     is_update: bool = Field(False, exclude=True)
+
+
+class ShiftPlaceRow(TypedDict):
+    name: Annotated[str, Field(min_length=1)]
+    wage: Annotated[int, Field(ge=0)]
+    has_night_wage: bool
+    closing_day: Annotated[int, Field(ge=1, le=31)]
+    pay_day: Annotated[int, Field(ge=1, le=31)]
+
+
+class ShiftRow(TypedDict):
+    id: Annotated[int, Field(ge=1)]
+    user_id: Annotated[int, Field(ge=1)]
+    place_id: Annotated[int, Field(ge=1)]
+    start_datetime: datetime
+    end_datetime: datetime
+    break_time: time
+    places: ShiftPlaceRow
+
+
+# 勤務先情報(places)を結合したシフトのレコードを一括で検証する
+ShiftRowsAdapter = TypeAdapter(list[ShiftRow])
+
+
+class ShiftPlace():
+    """シフトが参照する勤務先情報
+
+    同じ内容の勤務先情報はプロセス全体で1つのオブジェクトを共有する(get で取得)。
+    """
+    __slots__ = ('name', 'wage', 'has_night_wage', 'closing_day', 'pay_day')
+
+    _table: ClassVar[dict[tuple, 'ShiftPlace']] = {}
+    _lock: ClassVar[threading.Lock] = threading.Lock()
+
+    def __init__(self, name: str, wage: int, has_night_wage: bool, closing_day: int, pay_day: int):
+        self.name = name
+        self.wage = wage
+        self.has_night_wage = has_night_wage
+        self.closing_day = closing_day
+        self.pay_day = pay_day
+
+    @classmethod
+    def get(cls, name: str, wage: int, has_night_wage: bool, closing_day: int, pay_day: int) -> 'ShiftPlace':
+        """共有の勤務先情報を取得(なければ作成)"""
+        key = (name, wage, has_night_wage, closing_day, pay_day)
+        place = cls._table.get(key)
+        if place is None:
+            with cls._lock:
+                place = cls._table.setdefault(key, cls(*key))
+        return place
+
+
+class ShiftRecord():
+    """セッションに保持するシフト
+
+    勤務先名・時給・締め日・給料日は共有の ShiftPlace を参照し、同名の属性で参照できる。
+    """
+    __slots__ = ('id', 'user_id', 'place_id', 'start_datetime', 'end_datetime', 'break_time', 'amount', 'place_info')
+
+    def __init__(
+        self,
+        id: int,
+        user_id: int,
+        place_id: int,
+        start_datetime: datetime,
+        end_datetime: datetime,
+        break_time: time,
+        amount: int,
+        place_info: ShiftPlace,
+    ):
+        self.id = id
+        self.user_id = user_id
+        self.place_id = place_id
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+        self.break_time = break_time
+        self.amount = amount
+        self.place_info = place_info
+
+    @property
+    def place(self) -> str:
+        return self.place_info.name
+
+    @property
+    def wage(self) -> int:
+        return self.place_info.wage
+
+    @property
+    def has_night_wage(self) -> bool:
+        return self.place_info.has_night_wage
+
+    @property
+    def closing_day(self) -> int:
+        return self.place_info.closing_day
+
+    @property
+    def pay_day(self) -> int:
+        return self.place_info.pay_day
+
+    def __repr__(self) -> str:
+        return f'ShiftRecord(id={self.id}, place={self.place!r}, start_datetime={self.start_datetime}, end_datetime={self.end_datetime})'
+
+
+class AddShiftResultSchema(BaseModel):
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    shift: ShiftRecord | None = None
+    replaced_ids: list[int] = []
@@ -0,0 +1,54 @@
+-- 無効化されたレコードの退避先 (module/db/archive.py で保持期間を過ぎたものを移動する)
+--
+-- 元のテーブルと同じ列に退避した日時を加えたもの。
+-- 勤務先は先に退避されることがあるため、外部キーは定義しない。
+
+-- 保持期間は無効化した日時から数える
+-- (列を追加する前に無効化されたレコードは、追加した日時から数える)
+ALTER TABLE shifts ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMP;
+ALTER TABLE templates ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMP;
+ALTER TABLE places ADD COLUMN IF NOT EXISTS invalidated_at TIMESTAMP;
+UPDATE shifts SET invalidated_at = CURRENT_TIMESTAMP WHERE NOT is_valid AND invalidated_at IS NULL;
+UPDATE templates SET invalidated_at = CURRENT_TIMESTAMP WHERE NOT is_valid AND invalidated_at IS NULL;
+UPDATE places SET invalidated_at = CURRENT_TIMESTAMP WHERE NOT is_valid AND invalidated_at IS NULL;
+
+CREATE TABLE IF NOT EXISTS shifts_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    place_id INTEGER NOT NULL,
+    start_datetime TIMESTAMP NOT NULL,
+    end_datetime TIMESTAMP NOT NULL,
+    break_time INTERVAL NOT NULL,
+    is_valid BOOLEAN NOT NULL,
+    invalidated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS templates_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    place_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    start_time INTERVAL NOT NULL,
+    end_time INTERVAL NOT NULL,
+    break_time INTERVAL NOT NULL,
+    is_valid BOOLEAN NOT NULL,
+    invalidated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS places_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    wage INTEGER NOT NULL,
+    has_night_wage BOOLEAN NOT NULL,
+    closing_day INTEGER NOT NULL,
+    pay_day INTEGER NOT NULL,
+    is_valid BOOLEAN NOT NULL,
+    invalidated_at TIMESTAMP,
+    archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 退避対象(無効化されたシフト)の検索用
+CREATE INDEX IF NOT EXISTS shifts_invalid_id_idx ON shifts (id) WHERE NOT is_valid;
@@ -0,0 +1,237 @@
+-- シフトの金額を計算 (module/core/amount.py の caliculate_amount と同じ計算)
+CREATE OR REPLACE FUNCTION caliculate_amount(
+    p_start_datetime TIMESTAMP,
+    p_end_datetime TIMESTAMP,
+    p_break_time INTERVAL,
+    p_wage INTEGER,
+    p_has_night_wage BOOLEAN
+) RETURNS BIGINT
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    break_minutes BIGINT := EXTRACT(HOUR FROM p_break_time)::BIGINT * 60 + EXTRACT(MINUTE FROM p_break_time)::BIGINT;
+    start_minute BIGINT;
+    total_minutes BIGINT;
+    day_minutes BIGINT;
+    night_minutes BIGINT;
+    work_seconds BIGINT;
+BEGIN
+    IF p_has_night_wage THEN
+        start_minute := FLOOR(EXTRACT(EPOCH FROM p_start_datetime) / 60)::BIGINT;
+        total_minutes := GREATEST(CEIL(EXTRACT(EPOCH FROM p_end_datetime - p_start_datetime) / 60)::BIGINT, 0);
+        night_minutes := count_night_minute(start_minute + total_minutes) - count_night_minute(start_minute);
+        day_minutes := total_minutes - night_minutes;
+
+        IF break_minutes > 0 THEN
+            IF day_minutes > night_minutes THEN
+                IF break_minutes < day_minutes THEN
+                    day_minutes := day_minutes - break_minutes;
+                ELSE
+                    day_minutes := 0;
+                    night_minutes := night_minutes - break_minutes;
+                END IF;
+            ELSE
+                IF break_minutes < night_minutes THEN
+                    night_minutes := night_minutes - break_minutes;
+                ELSE
+                    night_minutes := 0;
+                    day_minutes := day_minutes - break_minutes;
+                END IF;
+            END IF;
+        END IF;
+
+        -- double precision の round は Python の round と同じく偶数丸め
+        RETURN ROUND(p_wage::DOUBLE PRECISION * day_minutes / 60 + 1.25 * p_wage::DOUBLE PRECISION * night_minutes / 60)::BIGINT;
+    END IF;
+
+    -- timedelta.seconds と同じく1日未満の秒数で計算
+    work_seconds := MOD(MOD(FLOOR(EXTRACT(EPOCH FROM p_end_datetime - p_start_datetime - p_break_time))::BIGINT, 86400) + 86400, 86400);
+    RETURN ROUND(p_wage::DOUBLE PRECISION * work_seconds / 3600)::BIGINT;
+END;
+$$;
+
+-- 1970-01-01 0時から指定分までに含まれる深夜帯(22:00-05:00)の分数
+CREATE OR REPLACE FUNCTION count_night_minute(p_minute BIGINT) RETURNS BIGINT
+LANGUAGE sql IMMUTABLE AS $$
+    SELECT FLOOR(p_minute / 1440.0)::BIGINT * 420
+        + LEAST(p_minute - FLOOR(p_minute / 1440.0)::BIGINT * 1440, 300)
+        + GREATEST(p_minute - FLOOR(p_minute / 1440.0)::BIGINT * 1440 - 1320, 0);
+$$;
+
+-- 指定された締め日から、開始日時と終了日時を計算 (module/core/payroll_period.py の get_current_period と同じ計算)
+CREATE OR REPLACE FUNCTION get_date_period(p_today TIMESTAMP, p_closing_day INTEGER)
+RETURNS TABLE (start_datetime TIMESTAMP, end_datetime TIMESTAMP)
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    this_month DATE := DATE_TRUNC('month', p_today)::DATE;
+    prev_month DATE := (DATE_TRUNC('month', p_today) - INTERVAL '1 month')::DATE;
+    next_month DATE := (DATE_TRUNC('month', p_today) + INTERVAL '1 month')::DATE;
+    last_day_this_month INTEGER := EXTRACT(DAY FROM this_month + INTERVAL '1 month' - INTERVAL '1 day')::INTEGER;
+    last_day_prev_month INTEGER := EXTRACT(DAY FROM this_month - INTERVAL '1 day')::INTEGER;
+    last_day_next_month INTEGER := EXTRACT(DAY FROM next_month + INTERVAL '1 month' - INTERVAL '1 day')::INTEGER;
+BEGIN
+    IF EXTRACT(DAY FROM p_today) <= p_closing_day THEN
+        end_datetime := MAKE_TIMESTAMP(
+            EXTRACT(YEAR FROM this_month)::INTEGER, EXTRACT(MONTH FROM this_month)::INTEGER,
+            LEAST(p_closing_day, last_day_this_month), 23, 59, 59
+        );
+
+        IF p_closing_day + 1 > last_day_prev_month THEN
+            start_datetime := MAKE_TIMESTAMP(
+                EXTRACT(YEAR FROM this_month)::INTEGER, EXTRACT(MONTH FROM this_month)::INTEGER, 1, 0, 0, 0
+            );
+        ELSE
+            start_datetime := MAKE_TIMESTAMP(
+                EXTRACT(YEAR FROM prev_month)::INTEGER, EXTRACT(MONTH FROM prev_month)::INTEGER, p_closing_day + 1, 0, 0, 0
+            );
+        END IF;
+    ELSE
+        start_datetime := MAKE_TIMESTAMP(
+            EXTRACT(YEAR FROM this_month)::INTEGER, EXTRACT(MONTH FROM this_month)::INTEGER,
+            LEAST(p_closing_day + 1, last_day_this_month), 0, 0, 0
+        );
+        end_datetime := MAKE_TIMESTAMP(
+            EXTRACT(YEAR FROM next_month)::INTEGER, EXTRACT(MONTH FROM next_month)::INTEGER,
+            LEAST(p_closing_day, last_day_next_month), 23, 59, 59
+        );
+    END IF;
+
+    RETURN NEXT;
+END;
+$$;
+
+-- ホーム画面の集計 (今期の給料、年間の給料、次回の出勤日、勤務先ごとの見込額)
+CREATE OR REPLACE FUNCTION get_home_dashboard(p_user_id INTEGER, p_today TIMESTAMP) RETURNS JSON
+LANGUAGE sql STABLE AS $$
+    WITH valid_shifts AS (
+        SELECT
+            s.place_id,
+            p.name AS place,
+            p.closing_day,
+            p.pay_day,
+            s.start_datetime,
+            s.end_datetime,
+            caliculate_amount(s.start_datetime, s.end_datetime, s.break_time, p.wage, p.has_night_wage) AS amount
+        FROM shifts s
+        JOIN places p ON p.id = s.place_id
+        WHERE s.user_id = p_user_id AND s.is_valid
+            -- 集計に必要なのは今年の初めと前月の初めの早い方以降に終わるシフトのみ
+            AND s.end_datetime > LEAST(DATE_TRUNC('year', p_today), DATE_TRUNC('month', p_today) - INTERVAL '1 month')
+    ),
+    main_period AS (
+        SELECT * FROM get_date_period(p_today, 31)
+    ),
+    place_periods AS (
+        SELECT
+            v.place_id,
+            v.place,
+            closing.start_datetime,
+            closing.end_datetime,
+            pay.end_datetime AS pay_datetime
+        FROM (SELECT DISTINCT place_id, place, closing_day, pay_day FROM valid_shifts) v
+        CROSS JOIN LATERAL get_date_period(p_today, v.closing_day) closing
+        CROSS JOIN LATERAL get_date_period(p_today, v.pay_day) pay
+    ),
+    place_infos AS (
+        SELECT
+            pp.place_id,
+            pp.place,
+            SUM(v.amount) FILTER (WHERE pp.start_datetime < v.end_datetime AND v.end_datetime <= pp.end_datetime) AS amount,
+            MIN(v.start_datetime) FILTER (WHERE v.start_datetime > p_today) AS next_shift,
+            FLOOR(EXTRACT(EPOCH FROM pp.end_datetime - p_today) / 86400)::INTEGER AS to_closing_day,
+            FLOOR(EXTRACT(EPOCH FROM pp.pay_datetime - p_today) / 86400)::INTEGER AS to_pay_day
+        FROM place_periods pp
+        JOIN valid_shifts v ON v.place_id = pp.place_id
+        GROUP BY pp.place_id, pp.place, pp.end_datetime, pp.pay_datetime
+    )
+    SELECT JSON_BUILD_OBJECT(
+        'start_datetime', (SELECT start_datetime FROM main_period),
+        'end_datetime', (SELECT end_datetime FROM main_period),
+        'current_amount', COALESCE((
+            SELECT SUM(amount) FROM valid_shifts
+            WHERE (SELECT start_datetime FROM main_period) < end_datetime AND end_datetime <= p_today
+        ), 0),
+        'year_amount', COALESCE((
+            SELECT SUM(amount) FROM valid_shifts
+            WHERE DATE_TRUNC('year', p_today) < end_datetime AND end_datetime <= p_today
+        ), 0),
+        'next_shift', (SELECT MIN(start_datetime) FROM valid_shifts WHERE start_datetime > p_today),
+        'places', COALESCE((
+            SELECT JSON_AGG(JSON_BUILD_OBJECT(
+                'place_id', place_id,
+                'place', place,
+                'amount', amount,
+                'next_shift', next_shift,
+                'to_closing_day', to_closing_day,
+                'to_pay_day', to_pay_day
+            ) ORDER BY place)
+            FROM place_infos
+            WHERE amount <> 0
+        ), '[]'::JSON)
+    );
+$$;
+
+-- 無効化されたレコードを退避先のテーブルに移動し、移動した件数を返す (module/db/archive.py から呼び出す)
+-- 1回の呼び出しで p_batch_size 件まで移動する(呼び出しごとに1つのトランザクション)。
+-- 無効化した日時が p_before より前のもののみ移動し、勤務先はシフト・テンプレートから参照されていないもののみ移動する。
+CREATE OR REPLACE FUNCTION archive_invalid_rows(p_table TEXT, p_before TIMESTAMP, p_batch_size INTEGER) RETURNS INTEGER
+LANGUAGE plpgsql AS $$
+DECLARE
+    moved_count INTEGER;
+BEGIN
+    IF p_table = 'shifts' THEN
+        WITH moved AS (
+            DELETE FROM shifts
+            WHERE id IN (
+                SELECT id FROM shifts
+                WHERE NOT is_valid AND invalidated_at < p_before
+                ORDER BY id
+                LIMIT p_batch_size
+            )
+            RETURNING *
+        ), archived AS (
+            INSERT INTO shifts_archive (id, user_id, place_id, start_datetime, end_datetime, break_time, is_valid, invalidated_at)
+            SELECT id, user_id, place_id, start_datetime, end_datetime, break_time, is_valid, invalidated_at FROM moved
+            ON CONFLICT (id) DO NOTHING
+        )
+        SELECT COUNT(*) INTO moved_count FROM moved;
+    ELSIF p_table = 'templates' THEN
+        WITH moved AS (
+            DELETE FROM templates
+            WHERE id IN (
+                SELECT id FROM templates
+                WHERE NOT is_valid AND invalidated_at < p_before
+                ORDER BY id
+                LIMIT p_batch_size
+            )
+            RETURNING *
+        ), archived AS (
+            INSERT INTO templates_archive (id, user_id, place_id, name, start_time, end_time, break_time, is_valid, invalidated_at)
+            SELECT id, user_id, place_id, name, start_time, end_time, break_time, is_valid, invalidated_at FROM moved
+            ON CONFLICT (id) DO NOTHING
+        )
+        SELECT COUNT(*) INTO moved_count FROM moved;
+    ELSIF p_table = 'places' THEN
+        WITH moved AS (
+            DELETE FROM places
+            WHERE id IN (
+                SELECT p.id FROM places p
+                WHERE NOT p.is_valid AND p.invalidated_at < p_before
+                    AND NOT EXISTS (SELECT 1 FROM shifts s WHERE s.place_id = p.id)
+                    AND NOT EXISTS (SELECT 1 FROM templates t WHERE t.place_id = p.id)
+                ORDER BY p.id
+                LIMIT p_batch_size
+            )
+            RETURNING *
+        ), archived AS (
+            INSERT INTO places_archive (id, user_id, name, wage, has_night_wage, closing_day, pay_day, is_valid, invalidated_at)
+            SELECT id, user_id, name, wage, has_night_wage, closing_day, pay_day, is_valid, invalidated_at FROM moved
+            ON CONFLICT (id) DO NOTHING
+        )
+        SELECT COUNT(*) INTO moved_count FROM moved;
+    ELSE
+        RAISE EXCEPTION 'unsupported table: %', p_table;
+    END IF;
+
+    RETURN moved_count;
+END;
+$$;
@@ -0,0 +1,42 @@
+-- 有効なレコードに対する検索用のインデックスと、シフトの重複を防ぐ排他制約
+--
+-- 既存のシフトに重複がある場合は排他制約を追加できないため、
+-- 事前に以下のクエリで重複を確認し、不要なシフトを無効化しておくこと。
+--
+-- SELECT a.id, b.id
+-- FROM shifts a
+-- JOIN shifts b ON a.user_id = b.user_id AND a.place_id = b.place_id AND a.id < b.id
+-- WHERE a.is_valid AND b.is_valid
+--     AND a.end_datetime > b.start_datetime AND a.start_datetime < b.end_datetime;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- ログイン、ユーザー名の重複確認
+CREATE INDEX IF NOT EXISTS users_username_idx ON users (username) WHERE is_valid;
+
+-- 勤務先の取得、名前の重複確認
+CREATE INDEX IF NOT EXISTS places_user_id_id_idx ON places (user_id, id) WHERE is_valid;
+CREATE INDEX IF NOT EXISTS places_user_id_name_idx ON places (user_id, name) WHERE is_valid;
+
+-- シフトの取得(開始日時順)、勤務先削除時の確認
+CREATE INDEX IF NOT EXISTS shifts_user_id_start_datetime_idx ON shifts (user_id, start_datetime, id) WHERE is_valid;
+CREATE INDEX IF NOT EXISTS shifts_place_id_idx ON shifts (place_id) WHERE is_valid;
+
+-- テンプレートの取得、名前の重複確認、勤務先削除時の確認
+CREATE INDEX IF NOT EXISTS templates_user_id_id_idx ON templates (user_id, id) WHERE is_valid;
+CREATE INDEX IF NOT EXISTS templates_name_idx ON templates (name) WHERE is_valid;
+CREATE INDEX IF NOT EXISTS templates_place_id_idx ON templates (place_id) WHERE is_valid;
+
+-- 同じユーザー・勤務先で勤務時間が重なる有効なシフトを禁止
+-- (重複の確認はこの制約の GiST インデックスで行われ、同時に追加されても重複しない)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'shifts_no_overlap_excl') THEN
+        ALTER TABLE shifts ADD CONSTRAINT shifts_no_overlap_excl EXCLUDE USING gist (
+            user_id WITH =,
+            place_id WITH =,
+            tsrange(start_datetime, end_datetime) WITH &&
+        ) WHERE (is_valid);
+    END IF;
+END
+$$;
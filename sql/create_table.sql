@@ -15,6 +15,7 @@ CREATE TABLE places (
     closing_day INTEGER NOT NULL,
     pay_day INTEGER NOT NULL,
     is_valid BOOLEAN NOT NULL DEFAULT true,
+    invalidated_at TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id)
 );
 
@@ -26,6 +27,7 @@ CREATE TABLE shifts (
     end_datetime TIMESTAMP NOT NULL,
     break_time INTERVAL NOT NULL,
     is_valid BOOLEAN NOT NULL DEFAULT true,
+    invalidated_at TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (place_id) REFERENCES places (id)
 );
@@ -39,6 +41,7 @@ CREATE TABLE templates (
     end_time INTERVAL NOT NULL,
     break_time INTERVAL NOT NULL,
     is_valid BOOLEAN NOT NULL DEFAULT true,
+    invalidated_at TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users (id),
     FOREIGN KEY (place_id) REFERENCES places (id)
 );
@@ -0,0 +1,126 @@
+"""シフトの金額計算のテスト
+
+caliculate_amount(1件ずつ)と caliculate_amounts(一括)が、
+元の1分刻みのループによる計算と同じ金額になることを確認する。
+"""
+import random
+import sys
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from module.core.amount import caliculate_amount, caliculate_amounts  # noqa: E402
+
+
+def _reference_amount(start_datetime: datetime, end_datetime: datetime, break_time: time, wage: int, has_night_wage: bool) -> int:
+    """元の実装(1分刻みのループ)による金額計算"""
+    if has_night_wage:
+        day_minutes = 0
+        night_minutes = 0
+        current_datetime = start_datetime
+
+        while current_datetime < end_datetime:
+            if current_datetime.hour >= 22 or current_datetime.hour < 5:
+                night_minutes += 1
+            else:
+                day_minutes += 1
+            current_datetime += timedelta(minutes=1)
+
+        break_minutes = break_time.hour * 60 + break_time.minute
+        if break_minutes > 0:
+            if day_minutes > night_minutes:
+                if break_minutes < day_minutes:
+                    day_minutes -= break_minutes
+                else:
+                    day_minutes = 0
+                    night_minutes -= break_minutes - day_minutes
+            else:
+                if break_minutes < night_minutes:
+                    night_minutes -= break_minutes
+                else:
+                    night_minutes = 0
+                    day_minutes -= break_minutes - night_minutes
+
+        return round(wage * day_minutes / 60 + 1.25 * wage * night_minutes / 60)
+
+    return round(wage * (end_datetime - start_datetime - timedelta(hours=break_time.hour, minutes=break_time.minute)).seconds / 3600)
+
+
+def _caliculate_amounts(shifts: list[tuple[datetime, datetime, time, int, bool]]) -> list[int]:
+    """caliculate_amounts で一括計算した金額"""
+    amounts = caliculate_amounts(
+        np.array([shift[0] for shift in shifts], dtype='datetime64[us]'),
+        np.array([shift[1] for shift in shifts], dtype='datetime64[us]'),
+        np.array([shift[2].hour * 60 + shift[2].minute for shift in shifts], dtype=np.int64),
+        np.array([shift[3] for shift in shifts], dtype=np.int64),
+        np.array([shift[4] for shift in shifts], dtype=bool),
+    )
+    return amounts.tolist()
+
+
+def _random_shifts(count: int) -> list[tuple[datetime, datetime, time, int, bool]]:
+    """乱数で作成したシフト(秒単位の端数や日付をまたぐもの、終了が開始より前のものを含む)"""
+    rng = random.Random(20240401)
+    shifts = []
+    for _ in range(count):
+        start_datetime = datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(366 * 24 * 3600))
+        end_datetime = start_datetime + timedelta(seconds=rng.randrange(-2 * 3600, 30 * 3600))
+        break_time = time(rng.randrange(4), rng.choice([0, 15, 30, 45, rng.randrange(60)]))
+        wage = rng.randrange(900, 2000)
+        has_night_wage = rng.random() < 0.5
+        shifts.append((start_datetime, end_datetime, break_time, wage, has_night_wage))
+    return shifts
+
+
+QUIRK_SHIFTS = [
+    # 日中のみ・深夜のみ・深夜帯の境界をまたぐもの
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 1, 18, 0), time(1, 0), 1100, True),
+    (datetime(2024, 4, 1, 22, 0), datetime(2024, 4, 2, 5, 0), time(1, 0), 1100, True),
+    (datetime(2024, 4, 1, 18, 0), datetime(2024, 4, 2, 3, 0), time(0, 45), 1100, True),
+    (datetime(2024, 4, 1, 4, 30), datetime(2024, 4, 1, 5, 30), time(0, 0), 1100, True),
+    # 秒単位の端数(深夜手当ありは開始から1分刻みで数える)
+    (datetime(2024, 4, 1, 21, 59, 30), datetime(2024, 4, 1, 22, 0, 1), time(0, 0), 1100, True),
+    (datetime(2024, 4, 1, 9, 0, 15), datetime(2024, 4, 1, 17, 0, 45), time(0, 30), 1100, False),
+    # 休憩が日中(深夜)の勤務時間以上の場合、日中(深夜)を0にして休憩全体を深夜(日中)から引く
+    (datetime(2024, 4, 1, 21, 0), datetime(2024, 4, 2, 4, 0), time(1, 0), 1100, True),
+    (datetime(2024, 4, 1, 20, 0), datetime(2024, 4, 1, 23, 0), time(2, 0), 1100, True),
+    (datetime(2024, 4, 1, 20, 0), datetime(2024, 4, 1, 23, 0), time(3, 30), 1100, True),
+    (datetime(2024, 4, 1, 22, 0), datetime(2024, 4, 1, 23, 0), time(2, 0), 1100, True),
+    # 日中と深夜が同じ分数の場合は深夜から引く
+    (datetime(2024, 4, 1, 21, 0), datetime(2024, 4, 1, 23, 0), time(0, 30), 1100, True),
+    # 終了が開始より前の場合、深夜手当ありは0分、なしは timedelta.seconds により1日未満の秒数になる
+    (datetime(2024, 4, 1, 18, 0), datetime(2024, 4, 1, 17, 0), time(0, 0), 1100, True),
+    (datetime(2024, 4, 1, 18, 0), datetime(2024, 4, 1, 17, 0), time(0, 0), 1100, False),
+    # 休憩が勤務時間より長い場合も timedelta.seconds により1日未満の秒数になる
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 1, 10, 0), time(2, 0), 1100, False),
+    # 24時間以上の勤務は timedelta.seconds により1日分が切り捨てられる
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 2, 10, 0), time(0, 0), 1100, False),
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 2, 10, 0), time(0, 0), 1100, True),
+    # 偶数丸め(1000円で3分 = 50円、1001円で30分 = 500.5円)
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 1, 9, 3), time(0, 0), 1000, True),
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 1, 9, 30), time(0, 0), 1001, False),
+    (datetime(2024, 4, 1, 9, 0), datetime(2024, 4, 1, 9, 30), time(0, 0), 1001, True),
+]
+
+RANDOM_SHIFTS = _random_shifts(500)
+
+
+@pytest.mark.parametrize('shift', QUIRK_SHIFTS)
+def test_caliculate_amount_quirks(shift):
+    assert caliculate_amount(*shift) == _reference_amount(*shift)
+
+
+def test_caliculate_amount_random():
+    for shift in RANDOM_SHIFTS:
+        assert caliculate_amount(*shift) == _reference_amount(*shift), shift
+
+
+def test_caliculate_amounts():
+    shifts = QUIRK_SHIFTS + RANDOM_SHIFTS
+    assert _caliculate_amounts(shifts) == [_reference_amount(*shift) for shift in shifts]